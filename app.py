@@ -5,7 +5,11 @@
 # ============================================================
 
 from pathlib import Path
+from functools import partial, reduce
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
@@ -180,18 +184,19 @@ if not ARQ_EXCEL.exists():
     logger.error(f"Arquivo não encontrado: {ARQ_EXCEL}")
     st.stop()
 
-# Carregar com cache e validação
+# Carregar com cache e validação (cache em disco via Parquet ao lado do Excel)
+# mtime_ns entra na chave do cache em memória: salvar a planilha com o app aberto força a releitura
+# Todas as colunas da planilha são lidas: as páginas de qualidade e análise usam cada variável numérica
 @st.cache_data(show_spinner=True)
-def carregar_dados(caminho: Path) -> pd.DataFrame:
-    return carregar_excel_com_validacao(caminho)
+def carregar_dados(caminho: Path, mtime_ns: int) -> pd.DataFrame:
+    return carregar_excel_com_cache_parquet(caminho)
 
 try:
     with st.spinner("⏳ Carregando dados..."):
-        df_raw = carregar_dados(ARQ_EXCEL)
-        df = df_raw.copy()
+        df_raw = carregar_dados(ARQ_EXCEL, ARQ_EXCEL.stat().st_mtime_ns)
         
         # Validar qualidade
-        qualidade = validar_qualidade_dados(df)
+        qualidade = validar_qualidade_dados(df_raw)
         
         # Mostrar alerta se houver problemas
         if qualidade["percentual_nulos"] > 10:
@@ -203,47 +208,100 @@ except Exception as e:
     st.stop()
 
 # ------------------------------------------------------------
-# Processamento inicial
+# Processamento inicial (cacheado por base bruta + configuração de macros)
 # ------------------------------------------------------------
+@st.cache_data(show_spinner=False)
+def preparar_base(df_raw: pd.DataFrame, df_macro_ctrl: pd.DataFrame) -> tuple:
+    """
+    Aplica limpeza, tabela de locais e JOIN de Macro MKT sobre a base bruta
+    Retorna: (df, df_locais, lista_hibridos, macros_ativas, linhas_removidas)
+    """
+    df = df_raw.copy(deep=False)  # sem cópia de dados (Copy-on-Write)
+    linhas_removidas = 0
 
-# 1) Filtrar valores vazios de prod_kg_ha_13_5
-if "prod_kg_ha_13_5" in df.columns:
-    df, linhas_removidas = filtrar_valores_vazios(df, "prod_kg_ha_13_5")
-    
-    if linhas_removidas > 0:
-        st.info(f"ℹ️ Removidas {linhas_removidas:,} linhas com prod_kg_ha_13_5 vazio")
+    # 1) Filtrar valores vazios de prod_kg_ha_13_5
+    if "prod_kg_ha_13_5" in df.columns:
+        df, linhas_removidas = filtrar_valores_vazios(df, "prod_kg_ha_13_5")
 
-# 2) Processar datas e safra
-df = processar_datas_safra(df)
+    # 2) Processar datas e safra
+    df = processar_datas_safra(df)
 
-# 3) Criar produtor_fazenda
-df = criar_produtor_fazenda(df)
+    # 3) Criar produtor_fazenda
+    df = criar_produtor_fazenda(df)
 
-# ------------------------------------------------------------
-# Tabela auxiliar de locais
-# ------------------------------------------------------------
-colunas_locais = ["estado_cod", "estado", "cidade", "produtor", "fazenda"]
+    # Tabela auxiliar de locais
+    colunas_locais = ["estado_cod", "estado", "cidade", "produtor", "fazenda"]
+
+    if set(colunas_locais).issubset(df.columns):
+        # produtor_fazenda já foi criada por criar_produtor_fazenda
+        df_locais = (
+            df[colunas_locais + ["produtor_fazenda"]]
+            .drop_duplicates(subset=["produtor_fazenda"])
+            .reset_index(drop=True)
+        )
+
+        # cidade_cod3: um único groupby, sem colunas temporárias
+        cidade_base = df_locais["cidade"].astype("string[pyarrow]").str.upper().str.strip().str[:3]
+        grupos = cidade_base.groupby(cidade_base)
+        cidade_seq = (grupos.cumcount() + 1).astype(str)
+        df_locais["cidade_cod3"] = np.where(
+            grupos.transform("size").eq(1),
+            cidade_base,
+            cidade_base + "_" + cidade_seq
+        )
+    else:
+        df_locais = pd.DataFrame()
+
+    # Padronização e JOIN Macro (strings Arrow: upper/strip rodam nos kernels do pyarrow)
+    for col in ["regional", "estado_cod"]:
+        if col in df.columns:
+            df[col] = df[col].astype("string[pyarrow]").str.upper().str.strip()
+
+    df = df.merge(
+        df_macro_ctrl[["regional", "estado_cod", "macro_mkt"]],
+        on=["regional", "estado_cod"],
+        how="left"
+    )
 
-if set(colunas_locais).issubset(df.columns):
-    df_locais = df[colunas_locais].copy()
-    df_locais["produtor_fazenda"] = (
-        df_locais["produtor"].astype(str).str.upper().str.strip()
-        + "_"
-        + df_locais["fazenda"].astype(str).str.upper().str.strip()
+    df["macro_mkt"] = (
+        df["macro_mkt"]
+        .astype("string[pyarrow]").str.upper().str.strip()
+        .replace("NAN", pd.NA)
     )
-    df_locais = df_locais.drop_duplicates(subset=["produtor_fazenda"]).reset_index(drop=True)
-
-    # cidade_cod3
-    df_locais["cidade_base"] = df_locais["cidade"].astype(str).str.upper().str.strip().str[:3]
-    df_locais["cidade_count"] = df_locais.groupby("cidade_base")["cidade_base"].transform("count")
-    df_locais["cidade_seq"] = df_locais.groupby("cidade_base").cumcount() + 1
-    df_locais["cidade_cod3"] = df_locais.apply(
-        lambda r: r["cidade_base"] if r["cidade_count"] == 1 else f"{r['cidade_base']}_{r['cidade_seq']}",
-        axis=1
+
+    # Colunas de baixa cardinalidade como categóricas (isin, merges e contagens sobre códigos inteiros)
+    for col in ["regional", "estado_cod", "macro_mkt", "safra", "hibrido"]:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+
+    macros_ativas = (
+        df_macro_ctrl.query("flag_inserir == 1")["macro_mkt"]
+        .dropna().unique().tolist()
     )
-    df_locais = df_locais.drop(columns=["cidade_base", "cidade_count", "cidade_seq"])
-else:
-    df_locais = pd.DataFrame()
+
+    # Filtro por códigos da categoria (comparação de inteiros em vez de strings)
+    codigos_ativos = df["macro_mkt"].cat.categories.get_indexer(list(set(macros_ativas)))
+    codigos_ativos = codigos_ativos[codigos_ativos >= 0]
+    df = df[np.isin(df["macro_mkt"].cat.codes.to_numpy(), codigos_ativos)].reset_index(drop=True)
+
+    # cidade_cod3 por lookup na chave produtor_fazenda (única em df_locais)
+    if not df_locais.empty and "produtor_fazenda" in df.columns:
+        df["cidade_cod3"] = df["produtor_fazenda"].map(
+            df_locais.set_index("produtor_fazenda")["cidade_cod3"]
+        )
+
+    # Híbridos
+    if "hibrido" in df.columns:
+        lista_hibridos = (
+            df["hibrido"].astype(str).str.strip()
+            .replace("nan", pd.NA).dropna()
+            .drop_duplicates().sort_values()
+            .tolist()
+        )
+    else:
+        lista_hibridos = []
+
+    return df, df_locais, lista_hibridos, macros_ativas, linhas_removidas
 
 # ------------------------------------------------------------
 # Macro MKT
@@ -307,67 +365,30 @@ with st.sidebar:
         else:
             st.error("❌ Erro ao salvar configuração")
 
-# Padronização e JOIN Macro
-for col in ["regional", "estado_cod"]:
-    if col in df.columns:
-        df[col] = df[col].astype(str).str.upper().str.strip()
-
+# Padronização da configuração de Macro MKT
 for col in ["regional", "estado_cod", "macro_mkt"]:
     df_macro_ctrl[col] = df_macro_ctrl[col].astype(str).str.upper().str.strip()
 
-df = df.merge(
-    df_macro_ctrl[["regional", "estado_cod", "macro_mkt"]],
-    on=["regional", "estado_cod"],
-    how="left"
-)
-
-df["macro_mkt"] = (
-    df["macro_mkt"]
-    .astype(str).str.upper().str.strip()
-    .replace("NAN", pd.NA)
-)
+df, df_locais, lista_hibridos, macros_ativas, linhas_removidas = preparar_base(df_raw, df_macro_ctrl)
 
-macros_ativas = (
-    df_macro_ctrl.query("flag_inserir == 1")["macro_mkt"]
-    .dropna().unique().tolist()
-)
-df = df[df["macro_mkt"].isin(macros_ativas)].copy()
-
-# JOIN cidade_cod3
-if not df_locais.empty and "produtor_fazenda" in df.columns:
-    df = df.merge(
-        df_locais[["produtor_fazenda", "cidade_cod3"]],
-        on="produtor_fazenda",
-        how="left"
-    )
+if linhas_removidas > 0:
+    st.info(f"ℹ️ Removidas {linhas_removidas:,} linhas com prod_kg_ha_13_5 vazio")
 
 # ------------------------------------------------------------
 # Híbridos
 # ------------------------------------------------------------
-if "hibrido" in df.columns:
-    lista_hibridos = (
-        df["hibrido"].astype(str).str.strip()
-        .replace("nan", pd.NA).dropna()
-        .drop_duplicates().sort_values()
-        .tolist()
-    )
-else:
-    lista_hibridos = []
-
-df_hibridos_base = pd.DataFrame({"hibrido": lista_hibridos, "flag_inserir": 1})
+df_hibridos_base = pd.DataFrame({
+    "hibrido": lista_hibridos,
+    "flag_inserir": np.ones(len(lista_hibridos), dtype="int8")
+})
 
 if "hibridos_ctrl" in st.session_state:
-    antigo = st.session_state["hibridos_ctrl"].copy()
-    if "flag_inserir" not in antigo.columns:
-        antigo["flag_inserir"] = 1
-    df_hibridos_base = df_hibridos_base.merge(
-        antigo[["hibrido", "flag_inserir"]],
-        on="hibrido",
-        how="left",
-        suffixes=("", "_old")
-    )
-    df_hibridos_base["flag_inserir"] = df_hibridos_base["flag_inserir_old"].fillna(1).astype(int)
-    df_hibridos_base = df_hibridos_base.drop(columns=["flag_inserir_old"])
+    antigo = st.session_state["hibridos_ctrl"]
+    if "flag_inserir" in antigo.columns:
+        flags_antigas = dict(zip(antigo["hibrido"], antigo["flag_inserir"]))
+        df_hibridos_base["flag_inserir"] = (
+            df_hibridos_base["hibrido"].map(flags_antigas).fillna(1).astype("int8")
+        )
 
 st.session_state["hibridos_ctrl"] = df_hibridos_base.copy()
 
@@ -391,30 +412,34 @@ with st.sidebar:
 # Aplicar filtro de híbridos
 if "hibrido" in df.columns and not df_hibridos_ctrl.empty:
     hibridos_ativos = df_hibridos_ctrl.query("flag_inserir == 1")["hibrido"].tolist()
-    df_filtrado = df[df["hibrido"].astype(str).str.strip().isin(hibridos_ativos)].copy()
+    df_filtrado = df[df["hibrido"].astype(str).str.strip().isin(hibridos_ativos)]
 else:
-    df_filtrado = df.copy()
+    df_filtrado = df
 
 # ------------------------------------------------------------
 # Colunas
 # ------------------------------------------------------------
 df_colunas_base = pd.DataFrame(COLUNAS_BASE, columns=["nome_coluna", "flag_inserir", "ordem"])
+df_colunas_base = df_colunas_base.astype({"flag_inserir": "int8", "ordem": "int16"})
 
 if "colunas_ctrl" in st.session_state:
-    antigo = st.session_state["colunas_ctrl"].copy()
-    if "flag_inserir" not in antigo.columns:
-        antigo["flag_inserir"] = 1
-    if "ordem" not in antigo.columns:
-        antigo["ordem"] = range(1, len(antigo) + 1)
-    df_colunas_base = df_colunas_base.merge(
-        antigo[["nome_coluna", "flag_inserir", "ordem"]],
-        on="nome_coluna",
-        how="left",
-        suffixes=("", "_old")
+    antigo = st.session_state["colunas_ctrl"]
+    flags_antigas = dict(zip(
+        antigo["nome_coluna"],
+        antigo["flag_inserir"] if "flag_inserir" in antigo.columns else [1] * len(antigo)
+    ))
+    ordens_antigas = dict(zip(
+        antigo["nome_coluna"],
+        antigo["ordem"] if "ordem" in antigo.columns else range(1, len(antigo) + 1)
+    ))
+    df_colunas_base["flag_inserir"] = (
+        df_colunas_base["nome_coluna"].map(flags_antigas)
+        .fillna(df_colunas_base["flag_inserir"]).astype("int8")
+    )
+    df_colunas_base["ordem"] = (
+        df_colunas_base["nome_coluna"].map(ordens_antigas)
+        .fillna(df_colunas_base["ordem"]).astype("int16")
     )
-    df_colunas_base["flag_inserir"] = df_colunas_base["flag_inserir_old"].fillna(df_colunas_base["flag_inserir"]).astype(int)
-    df_colunas_base["ordem"] = df_colunas_base["ordem_old"].fillna(df_colunas_base["ordem"]).astype(int)
-    df_colunas_base = df_colunas_base.drop(columns=["flag_inserir_old", "ordem_old"])
 
 st.session_state["colunas_ctrl"] = df_colunas_base.copy()
 
@@ -452,13 +477,10 @@ colunas_ativas = (
 
 colunas_ativas = [c for c in colunas_ativas if c in df_filtrado.columns]
 
-df_final = df_filtrado[colunas_ativas].copy()
-st.session_state["df_final"] = df_final
+# Apenas referências (sem cópia); regravado a cada rerun para acompanhar a releitura da planilha
 st.session_state["df_raw"] = df_raw
 st.session_state["df_filtrado"] = df_filtrado
 
-logger.info(f"✅ df_final salvo no session_state: {len(df_final)} registros")
-
 # ------------------------------------------------------------
 # FILTROS RÁPIDOS
 # ------------------------------------------------------------
@@ -466,9 +488,12 @@ st.markdown("### 🔍 Filtros Rápidos")
 
 col1, col2, col3, col4 = st.columns(4)
 
+# Máscara única composta pelos quatro filtros (sem cópias intermediárias)
+mask = np.ones(len(df_filtrado), dtype=bool)
+
 with col1:
     if "safra" in df_filtrado.columns:
-        safras_disponiveis = sorted(df_filtrado["safra"].dropna().unique())
+        safras_disponiveis = opcoes_ordenadas(df_filtrado["safra"])
         safra_selecionada = st.multiselect(
             "Safra",
             options=safras_disponiveis,
@@ -476,11 +501,11 @@ with col1:
             key="filtro_safra"
         )
         if safra_selecionada:
-            df_filtrado = df_filtrado[df_filtrado["safra"].isin(safra_selecionada)]
+            mask &= df_filtrado["safra"].isin(safra_selecionada).to_numpy()
 
 with col2:
     if "estado_cod" in df_filtrado.columns:
-        estados = sorted(df_filtrado["estado_cod"].dropna().unique())
+        estados = opcoes_ordenadas(df_filtrado.loc[mask, "estado_cod"])
         estado_selecionado = st.multiselect(
             "Estado",
             options=estados,
@@ -488,7 +513,7 @@ with col2:
             key="filtro_estado"
         )
         if estado_selecionado:
-            df_filtrado = df_filtrado[df_filtrado["estado_cod"].isin(estado_selecionado)]
+            mask &= df_filtrado["estado_cod"].isin(estado_selecionado).to_numpy()
 
 with col3:
     if "prod_sc_ha_13_5" in df_filtrado.columns:
@@ -500,18 +525,31 @@ with col3:
             key="filtro_prod_min"
         )
         if prod_min > 0:
-            df_filtrado = df_filtrado[df_filtrado["prod_sc_ha_13_5"] >= prod_min]
+            mask &= (df_filtrado["prod_sc_ha_13_5"] >= prod_min).to_numpy()
 
 with col4:
     busca = st.text_input("🔎 Buscar", placeholder="Digite para buscar...", key="busca_texto")
     if busca:
-        mask = df_filtrado.astype(str).apply(lambda x: x.str.contains(busca, case=False, na=False)).any(axis=1)
-        df_filtrado = df_filtrado[mask]
+        # Busca apenas nas colunas de texto, com o kernel de substring do Arrow
+        colunas_busca = df_filtrado.select_dtypes(include=["object", "string", "category"]).columns
+        if len(colunas_busca) > 0:
+            ocorrencias = [
+                pc.match_substring(pa.array(df_filtrado[col].astype(str), type=pa.string()), busca, ignore_case=True)
+                for col in colunas_busca
+            ]
+            mask &= reduce(pc.or_, ocorrencias).to_numpy(zero_copy_only=False)
+        else:
+            mask[:] = False
+
+# Aplicar filtros rápidos e montar df_final uma única vez
+if not mask.all():
+    df_filtrado = df_filtrado[mask]
 
-# Atualizar df_final com filtros rápidos
-df_final = df_filtrado[colunas_ativas].copy()
+df_final = df_filtrado[colunas_ativas]
 st.session_state["df_final"] = df_final
 
+logger.info(f"✅ df_final salvo no session_state: {len(df_final)} registros")
+
 st.markdown("---")
 
 # ------------------------------------------------------------
@@ -525,47 +563,64 @@ st.markdown("---")
 # ------------------------------------------------------------
 # GRÁFICOS DE RESUMO
 # ------------------------------------------------------------
+@st.cache_data(max_entries=8, show_spinner=False)
+def figura_box_safra(df_plot: pd.DataFrame) -> go.Figure:
+    fig = px.box(
+        df_plot,
+        x="safra",
+        y="prod_sc_ha_13_5",
+        title="Distribuição de Produtividade por Safra",
+        color_discrete_sequence=[PALETA_CORES['primary']],
+        labels={"prod_sc_ha_13_5": "Produtividade (sc/ha)", "safra": "Safra"}
+    )
+    fig.update_layout(
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font=dict(color=PALETA_CORES['text_dark'])
+    )
+    return fig
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def figura_barras_macro(contagem: pd.DataFrame) -> go.Figure:
+    fig = px.bar(
+        contagem,
+        x="macro_mkt",
+        y="count",
+        title="Registros por Macro MKT",
+        color_discrete_sequence=[PALETA_CORES['secondary']],
+        labels={"count": "Quantidade", "macro_mkt": "Macro MKT"}
+    )
+    fig.update_layout(
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font=dict(color=PALETA_CORES['text_dark']),
+        xaxis_tickangle=-45,
+        xaxis_categoryorder="total descending"
+    )
+    return fig
+
+
 st.markdown("### 📈 Análise Visual")
 
 col1, col2 = st.columns(2)
 
 with col1:
     if "safra" in df_filtrado.columns and "prod_sc_ha_13_5" in df_filtrado.columns:
-        fig = px.box(
-            df_filtrado,
-            x="safra",
-            y="prod_sc_ha_13_5",
-            title="Distribuição de Produtividade por Safra",
-            color_discrete_sequence=[PALETA_CORES['primary']],
-            labels={"prod_sc_ha_13_5": "Produtividade (sc/ha)", "safra": "Safra"}
-        )
-        fig.update_layout(
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            font=dict(color=PALETA_CORES['text_dark'])
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        # Figuras em cache: só são refeitas quando os dados plotados mudam
+        df_plot = df_filtrado[["safra", "prod_sc_ha_13_5"]].dropna(subset=["prod_sc_ha_13_5"])
+        st.plotly_chart(figura_box_safra(df_plot), use_container_width=True)
 
 with col2:
     if "macro_mkt" in df_filtrado.columns:
-        contagem = df_filtrado["macro_mkt"].value_counts().reset_index()
-        contagem.columns = ["macro_mkt", "count"]
-        
-        fig = px.bar(
-            contagem,
-            x="macro_mkt",
-            y="count",
-            title="Registros por Macro MKT",
-            color_discrete_sequence=[PALETA_CORES['secondary']],
-            labels={"count": "Quantidade", "macro_mkt": "Macro MKT"}
-        )
-        fig.update_layout(
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            font=dict(color=PALETA_CORES['text_dark']),
-            xaxis_tickangle=-45
+        # Contagem sobre os códigos da categoria; a ordenação fica a cargo do Plotly
+        contagem = (
+            df_filtrado.groupby("macro_mkt", observed=True, sort=False)
+            .size()
+            .rename("count")
+            .reset_index()
         )
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(figura_barras_macro(contagem), use_container_width=True)
 
 st.markdown("---")
 
@@ -580,14 +635,25 @@ st.markdown("""
 
 st.markdown(f"<p class='caption-text'>Visualizando {len(df_filtrado):,} registros após aplicação dos filtros</p>", unsafe_allow_html=True)
 
-df_view = df_filtrado.copy()
-if "plantio" in df_view.columns:
-    df_view["plantio"] = pd.to_datetime(df_view["plantio"], errors="coerce", dayfirst=True).dt.strftime("%d/%m/%Y")
-
 # AgGrid
-criar_aggrid(df_view, altura=AGGRID_OPTIONS["altura_principal"], colunas_texto=COLUNAS_TEXTO)
+criar_aggrid(df_filtrado, altura=AGGRID_OPTIONS["altura_principal"], colunas_texto=COLUNAS_TEXTO)
+
+# Botões de download (arquivos gerados apenas no clique e reaproveitados via cache)
+@st.cache_data(max_entries=4, show_spinner=False)
+def gerar_excel(df_export: pd.DataFrame) -> bytes:
+    return df_para_excel_bytes(df_export)
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def gerar_csv(df_export: pd.DataFrame) -> bytes:
+    return df_para_csv_bytes(df_export)
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def gerar_json(df_export: pd.DataFrame) -> str:
+    return df_para_json_str(df_export)
+
 
-# Botões de download
 st.markdown("### 💾 Exportar Dados")
 
 col1, col2, col3 = st.columns(3)
@@ -595,7 +661,7 @@ col1, col2, col3 = st.columns(3)
 with col1:
     st.download_button(
         label="📊 Excel (.xlsx)",
-        data=df_para_excel_bytes(df_view),
+        data=partial(gerar_excel, df_filtrado),
         file_name="producao_base_filtrada.xlsx",
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         use_container_width=True
@@ -604,7 +670,7 @@ with col1:
 with col2:
     st.download_button(
         label="📄 CSV",
-        data=df_para_csv_bytes(df_view),
+        data=partial(gerar_csv, df_filtrado),
         file_name="producao_base_filtrada.csv",
         mime="text/csv",
         use_container_width=True
@@ -613,7 +679,7 @@ with col2:
 with col3:
     st.download_button(
         label="🔧 JSON",
-        data=df_para_json_str(df_view),
+        data=partial(gerar_json, df_filtrado),
         file_name="producao_base_filtrada.json",
         mime="application/json",
         use_container_width=True
@@ -637,7 +703,7 @@ col1, col2, col3 = st.columns(3)
 with col1:
     st.download_button(
         label="📊 Excel (.xlsx)",
-        data=df_para_excel_bytes(df_final),
+        data=partial(gerar_excel, df_final),
         file_name="producao_df_final.xlsx",
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         use_container_width=True
@@ -646,7 +712,7 @@ with col1:
 with col2:
     st.download_button(
         label="📄 CSV",
-        data=df_para_csv_bytes(df_final),
+        data=partial(gerar_csv, df_final),
         file_name="producao_df_final.csv",
         mime="text/csv",
         use_container_width=True
@@ -655,7 +721,7 @@ with col2:
 with col3:
     st.download_button(
         label="🔧 JSON",
-        data=df_para_json_str(df_final),
+        data=partial(gerar_json, df_final),
         file_name="producao_df_final.json",
         mime="application/json",
         use_container_width=True
@@ -666,54 +732,83 @@ st.markdown("---")
 # ------------------------------------------------------------
 # ESTATÍSTICAS DESCRITIVAS
 # ------------------------------------------------------------
+@st.cache_data(max_entries=8, show_spinner=False)
+def calcular_resumo_estatistico(df_num: pd.DataFrame) -> pd.DataFrame:
+    return df_num.describe().T
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def calcular_correlacao(df_num: pd.DataFrame) -> pd.DataFrame:
+    return df_num.astype("float32").corr()
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def figura_correlacao(corr_matrix: pd.DataFrame) -> go.Figure:
+    fig = px.imshow(
+        corr_matrix,
+        text_auto='.2f',
+        aspect="auto",
+        color_continuous_scale="RdYlGn",
+        title="Correlação entre Variáveis Numéricas"
+    )
+    fig.update_layout(
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font=dict(color=PALETA_CORES['text_dark'])
+    )
+    return fig
+
+
 with st.expander("📊 Estatísticas Descritivas", expanded=False):
     colunas_numericas = df_final.select_dtypes(include=['number']).columns.tolist()
     
-    if colunas_numericas:
+    # O conteúdo do expander roda a cada rerun; só calcula quando solicitado
+    mostrar_estatisticas = st.checkbox(
+        "Calcular estatísticas e correlação",
+        value=False,
+        key="mostrar_estatisticas"
+    )
+    
+    if colunas_numericas and mostrar_estatisticas:
         st.markdown("#### Resumo Estatístico")
         st.dataframe(
-            df_final[colunas_numericas].describe().T.style.format("{:.2f}"),
+            calcular_resumo_estatistico(df_final[colunas_numericas]).style.format("{:.2f}"),
             use_container_width=True
         )
         
         # Correlação
         if len(colunas_numericas) > 1:
             st.markdown("#### Matriz de Correlação")
-            corr_matrix = df_final[colunas_numericas].corr()
+            corr_matrix = calcular_correlacao(df_final[colunas_numericas])
             
-            fig = px.imshow(
-                corr_matrix,
-                text_auto='.2f',
-                aspect="auto",
-                color_continuous_scale="RdYlGn",
-                title="Correlação entre Variáveis Numéricas"
-            )
-            fig.update_layout(
-                plot_bgcolor='white',
-                paper_bgcolor='white',
-                font=dict(color=PALETA_CORES['text_dark'])
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(figura_correlacao(corr_matrix), use_container_width=True)
 
 # ------------------------------------------------------------
 # COMPARAÇÃO COM BASE NÃO FILTRADA
 # ------------------------------------------------------------
+@st.cache_data(max_entries=8, show_spinner=False)
+def resumo_produtividade(df_base: pd.DataFrame) -> dict:
+    resumo = {"registros": len(df_base)}
+    if "prod_sc_ha_13_5" in df_base.columns:
+        resumo["media"] = float(df_base["prod_sc_ha_13_5"].mean())
+        resumo["mediana"] = float(df_base["prod_sc_ha_13_5"].median())
+    return resumo
+
+
 if st.checkbox("📊 Comparar com base não filtrada"):
+    # Resumos em cache por base: o da base original só é refeito quando df_raw muda
     col1, col2 = st.columns(2)
     
-    with col1:
-        st.markdown("#### 🔹 Dados Filtrados")
-        st.metric("Registros", f"{len(df_filtrado):,}")
-        if "prod_sc_ha_13_5" in df_filtrado.columns:
-            st.metric("Média Produtividade", f"{df_filtrado['prod_sc_ha_13_5'].mean():.1f} sc/ha")
-            st.metric("Mediana Produtividade", f"{df_filtrado['prod_sc_ha_13_5'].median():.1f} sc/ha")
-    
-    with col2:
-        st.markdown("#### 🔹 Dados Originais")
-        st.metric("Registros", f"{len(df_raw):,}")
-        if "prod_sc_ha_13_5" in df_raw.columns:
-            st.metric("Média Produtividade", f"{df_raw['prod_sc_ha_13_5'].mean():.1f} sc/ha")
-            st.metric("Mediana Produtividade", f"{df_raw['prod_sc_ha_13_5'].median():.1f} sc/ha")
+    for coluna, titulo, resumo in [
+        (col1, "Dados Filtrados", resumo_produtividade(df_filtrado)),
+        (col2, "Dados Originais", resumo_produtividade(df_raw)),
+    ]:
+        with coluna:
+            st.markdown(f"#### 🔹 {titulo}")
+            st.metric("Registros", f"{resumo['registros']:,}")
+            if "media" in resumo:
+                st.metric("Média Produtividade", f"{resumo['media']:.1f} sc/ha")
+                st.metric("Mediana Produtividade", f"{resumo['mediana']:.1f} sc/ha")
 
 st.markdown("---")
 
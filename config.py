@@ -54,8 +54,14 @@ COLUNAS_BASE = [
 AGGRID_OPTIONS = {
     "altura_principal": 400,
     "altura_auxiliar": 300,
+    "max_linhas_preview": 2000,
     "theme": "balham",
 }
 
+GRAFICOS_OPTIONS = {
+    # Acima disso (por grupo) box plots usam quartis pré-calculados e violinos, amostra estratificada
+    "max_pontos_por_grupo": 5000,
+}
+
 # Colunas que não devem ter formatação numérica
 COLUNAS_TEXTO = ["safra"]
\ No newline at end of file
@@ -10,101 +10,260 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
+import pyarrow as pa
 import sys
+from functools import partial
+from io import BytesIO
 from pathlib import Path
 
 # Adicionar diretório raiz ao path para importar módulos
 sys.path.append(str(Path(__file__).parent.parent))
 
-from config import PALETA_CORES
-from utils import criar_breadcrumb, criar_aggrid, logger
+from config import PALETA_CORES, AGGRID_OPTIONS, GRAFICOS_OPTIONS
+from utils import criar_breadcrumb, criar_aggrid, reduzir_tipos_numericos, preencher_template, mascara_categorias, logger
 
 # ============================================================
-# CONFIGURAÇÃO DA PÁGINA
-# ============================================================
-st.set_page_config(
-    page_title="Qualidade dos Dados",
-    page_icon="📊",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-# ============================================================
-# CSS CUSTOMIZADO
+# CONTEÚDO ESTÁTICO (CSS, CABEÇALHO E TEXTOS)
 # ============================================================
-st.markdown(f"""
+CSS_TEMPLATE = """
     <style>
-    .main {{
-        background-color: {PALETA_CORES['bg_light']};
-    }}
+    .main {
+        background-color: ${bg_light};
+    }
     
-    .metric-card {{
+    .metric-card {
         background: white;
         padding: 1.5rem;
         border-radius: 10px;
         box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        border-left: 4px solid {PALETA_CORES['secondary']};
+        border-left: 4px solid ${secondary};
         margin-bottom: 1rem;
-    }}
+    }
     
-    .quality-score {{
+    .quality-score {
         font-size: 3rem;
         font-weight: bold;
         text-align: center;
-    }}
+    }
     
-    .quality-excellent {{ color: #00a859; }}
-    .quality-good {{ color: #72d8a8; }}
-    .quality-warning {{ color: #ff9933; }}
-    .quality-poor {{ color: #dc3545; }}
+    .quality-excellent { color: #00a859; }
+    .quality-good { color: #72d8a8; }
+    .quality-warning { color: #ff9933; }
+    .quality-poor { color: #dc3545; }
     
-    .section-header {{
+    .section-header {
         background: white;
         padding: 1rem 1.5rem;
         border-radius: 8px;
         margin: 1.5rem 0 1rem 0;
-        border-left: 4px solid {PALETA_CORES['accent']};
+        border-left: 4px solid ${accent};
         box-shadow: 0 1px 3px rgba(0,0,0,0.1);
-    }}
+    }
     
-    .section-title {{
-        color: {PALETA_CORES['primary']};
+    .section-title {
+        color: ${primary};
         font-size: 1.5rem;
         font-weight: 600;
         margin: 0;
-    }}
+    }
     
-    .stTabs [data-baseweb="tab-list"] {{
+    .stTabs [data-baseweb="tab-list"] {
         gap: 12px;
         background-color: white;
         padding: 0.75rem;
         border-radius: 8px;
-    }}
+    }
     
-    .stTabs [data-baseweb="tab"] {{
-        background-color: {PALETA_CORES['bg_light']};
+    .stTabs [data-baseweb="tab"] {
+        background-color: ${bg_light};
         border-radius: 6px;
-        color: {PALETA_CORES['primary']};
+        color: ${primary};
         font-weight: 500;
         padding: 0.75rem 1.5rem !important;
-    }}
+    }
     
-    .stTabs [aria-selected="true"] {{
-        background: linear-gradient(135deg, {PALETA_CORES['primary']} 0%, {PALETA_CORES['secondary']} 100%);
+    .stTabs [aria-selected="true"] {
+        background: linear-gradient(135deg, ${primary} 0%, ${secondary} 100%);
         color: white;
-    }}
+    }
     </style>
-""", unsafe_allow_html=True)
+"""
+
+CSS_PAGINA = preencher_template(CSS_TEMPLATE, **PALETA_CORES)
+
+CABECALHO_TEMPLATE = """
+    <div style='background: linear-gradient(135deg, ${primary} 0%, ${secondary} 100%); 
+                padding: 2rem; border-radius: 10px; margin-bottom: 2rem; box-shadow: 0 4px 6px rgba(0,104,56,0.2);'>
+        <h1 style='color: white; margin: 0; text-shadow: 2px 2px 4px rgba(0,0,0,0.2);'>📊 Qualidade dos Dados</h1>
+        <p style='color: white; margin-top: 0.5rem; opacity: 0.95;'>Análise detalhada da completude e qualidade dos dados de produção</p>
+    </div>
+"""
+
+CABECALHO_HTML = preencher_template(CABECALHO_TEMPLATE, **PALETA_CORES)
+
+EXPLICACAO_SCORE_MD = """
+## 🎯 Score de Qualidade Total (0-100 pontos)
+
+O score de qualidade é uma métrica composta que avalia três dimensões principais dos seus dados:
+
+---
+
+### 📊 1. Completude (60% do score - máx. 60 pts)
+
+**O que mede:** Percentual de valores preenchidos (não nulos) em todo o dataset.
+
+**Fórmula:**
+
+`Completude = (Total de Valores - Valores Nulos) / Total de Valores × 100`
+
+`Score Completude = Completude × 0.60`
+
+**Interpretação:**
+- 🟢 **100%**: Todos os campos estão preenchidos
+- 🟡 **80-99%**: Alguns campos vazios, mas aceitável
+- 🔴 **< 80%**: Muitos dados faltantes, requer atenção
+
+---
+
+### 🔑 2. Unicidade (30% do score - máx. 30 pts)
+
+**O que mede:** Percentual de registros únicos (sem duplicatas).
+
+**Fórmula:**
+
+`Unicidade = (Total de Registros - Duplicatas) / Total de Registros × 100`
+
+`Score Unicidade = Unicidade × 0.30`
+
+**Interpretação:**
+- 🟢 **100%**: Nenhuma duplicata encontrada
+- 🟡 **95-99%**: Poucas duplicatas
+- 🔴 **< 95%**: Muitas duplicatas, verificar dados
+
+---
+
+### ✓ 3. Consistência (10% do score - máx. 10 pts)
+
+**O que mede:** Variabilidade dos dados numéricos.
+
+**Fórmula:**
+
+`Score Consistência = 10 - (2 × número de colunas com desvio padrão = 0)`
+
+**Interpretação:**
+- 🟢 **10 pts**: Todas as colunas têm variação natural
+- 🟡 **6-8 pts**: Algumas colunas sem variação
+- 🔴 **< 6 pts**: Muitas colunas constantes (possível erro)
+
+---
+
+### 🏆 Classificação Final
+
+| Score | Classificação | Significado |
+|-------|---------------|-------------|
+| 90-100 | 🟢 **Excelente** | Dados de alta qualidade, prontos para análise |
+| 75-89 | 🟢 **Bom** | Dados confiáveis, pequenas melhorias possíveis |
+| 60-74 | 🟡 **Regular** | Dados utilizáveis, mas requerem atenção |
+| < 60 | 🔴 **Ruim** | Dados com problemas, necessitam correção |
+
+---
+
+### 💡 Dicas para Melhorar o Score
+
+1. **Completude baixa?** 
+   - Identifique colunas com muitos nulos
+   - Preencha valores faltantes ou remova colunas desnecessárias
+
+2. **Unicidade baixa?**
+   - Verifique registros duplicados
+   - Identifique a causa (importação duplicada, erro de sistema)
+
+3. **Consistência baixa?**
+   - Verifique colunas com valores constantes
+   - Pode indicar erro na coleta ou dados default
+"""
+
+# ============================================================
+# CONFIGURAÇÃO DA PÁGINA
+# ============================================================
+st.set_page_config(
+    page_title="Qualidade dos Dados",
+    page_icon="📊",
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
+
+# ============================================================
+# CSS CUSTOMIZADO
+# ============================================================
+st.markdown(CSS_PAGINA, unsafe_allow_html=True)
 
 # ============================================================
 # FUNÇÕES AUXILIARES
 # ============================================================
+# Os caches recebem DataFrames e usam o hash nativo do st.cache_data
+# (hash_pandas_object vetorizado, por amostragem a partir de 50 mil linhas)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def otimizar_tipos(df: pd.DataFrame) -> pd.DataFrame:
+    """Reduz tipos numéricos e converte hibrido e textos de baixa cardinalidade em category"""
+    df = reduzir_tipos_numericos(df.copy(deep=False))
+    
+    for col in df.select_dtypes(include=['object']).columns:
+        if col == 'hibrido' or df[col].nunique() / max(len(df), 1) < 0.5:
+            df[col] = df[col].astype('category')
+    
+    return df
+
+
+def classificar_colunas(df: pd.DataFrame) -> tuple:
+    """Retorna (colunas numéricas exceto safra, colunas texto/categóricas)"""
+    numericas, categoricas = [], []
+    for col, dtype in df.dtypes.items():
+        if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+            if col != 'safra':
+                numericas.append(col)
+        elif dtype == object or isinstance(dtype, pd.CategoricalDtype):
+            categoricas.append(col)
+    return numericas, categoricas
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def tabela_arrow(df: pd.DataFrame) -> pa.Table:
+    """Tabela Arrow da base, convertida uma vez e compartilhada (somente leitura)"""
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def nulos_por_coluna(df: pd.DataFrame) -> np.ndarray:
+    """Nulos por coluna lidos do null_count das colunas Arrow, sem nova varredura"""
+    try:
+        tabela = tabela_arrow(df)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, ValueError):
+        # Colunas com tipos mistos não convertem para Arrow
+        return df.isna().to_numpy().sum(axis=0)
+    return np.array([coluna.null_count for coluna in tabela.columns], dtype=np.int64)
 
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def contar_nulos_duplicatas(df: pd.DataFrame) -> dict:
+    """Nulos (total e colunas afetadas) e duplicatas"""
+    nulos = nulos_por_coluna(df)
+    # Duplicatas pelo hash de 64 bits de cada linha (colunar, sem montar tuplas por linha)
+    hash_linhas = pd.util.hash_pandas_object(df, index=False)
+    return {
+        "valores_nulos": int(nulos.sum()),
+        "colunas_com_nulos": int((nulos > 0).sum()),
+        "duplicatas": int(hash_linhas.duplicated().sum())
+    }
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
 def calcular_score_qualidade(df: pd.DataFrame) -> dict:
     """Calcula score de qualidade dos dados (0-100)"""
+    contagens = contar_nulos_duplicatas(df)
     total_valores = df.size
-    valores_nulos = df.isnull().sum().sum()
-    duplicatas = df.duplicated().sum()
+    valores_nulos = contagens["valores_nulos"]
+    duplicatas = contagens["duplicatas"]
     
     completude = ((total_valores - valores_nulos) / total_valores) * 100 if total_valores > 0 else 0
     score_completude = (completude / 100) * 60
@@ -112,12 +271,15 @@ def calcular_score_qualidade(df: pd.DataFrame) -> dict:
     unicidade = ((len(df) - duplicatas) / len(df)) * 100 if len(df) > 0 else 0
     score_unicidade = (unicidade / 100) * 30
     
-    score_consistencia = 10
-    colunas_num = df.select_dtypes(include=['number']).columns
-    
-    for col in colunas_num:
-        if len(df[col].dropna()) > 0 and df[col].std() == 0:
-            score_consistencia -= 2
+    # Desvio padrão de todas as colunas numéricas de uma vez (colunas só com nulos dão NaN)
+    # Categorias de valores numéricos (ex.: safra) entram como números, como antes de virarem category
+    df_num = df.select_dtypes(include=['number']).assign(**{
+        col: df[col].astype('float64')
+        for col, dtype in df.dtypes.items()
+        if isinstance(dtype, pd.CategoricalDtype) and pd.api.types.is_numeric_dtype(dtype.categories.dtype)
+    })
+    desvios = df_num.std().to_numpy()
+    score_consistencia = 10 - 2 * int((desvios == 0).sum())
     
     score_total = score_completude + score_unicidade + max(0, score_consistencia)
     
@@ -143,18 +305,24 @@ def get_quality_class(score: float) -> tuple:
         return "Ruim", "quality-poor"
 
 
+@st.cache_data(show_spinner=False, max_entries=8)
 def analisar_valores_nulos(df: pd.DataFrame) -> pd.DataFrame:
     """Análise detalhada de valores nulos por coluna"""
-    nulos = df.isnull().sum()
+    nulos = nulos_por_coluna(df)
+    
+    # Base sem nulos (caso comum após a limpeza): nada a detalhar
+    if not nulos.any():
+        return pd.DataFrame(columns=['Coluna', 'Valores_Nulos', 'Percentual', 'Valores_Preenchidos'])
+    
     total = len(df)
     
-    percentuais = [(n / total * 100) for n in nulos.values] if total > 0 else [0] * len(nulos)
+    percentuais = (nulos / total * 100).round(2) if total > 0 else np.zeros(len(nulos))
     
     analise = pd.DataFrame({
-        'Coluna': nulos.index,
-        'Valores_Nulos': nulos.values,
-        'Percentual': [round(p, 2) for p in percentuais],
-        'Valores_Preenchidos': total - nulos.values
+        'Coluna': df.columns,
+        'Valores_Nulos': nulos,
+        'Percentual': percentuais,
+        'Valores_Preenchidos': total - nulos
     })
     
     analise = analise[analise['Valores_Nulos'] > 0].sort_values('Percentual', ascending=False)
@@ -162,32 +330,435 @@ def analisar_valores_nulos(df: pd.DataFrame) -> pd.DataFrame:
     return analise
 
 
-def analisar_outliers(df: pd.DataFrame, coluna: str) -> dict:
-    """Detecta outliers usando IQR"""
-    if not pd.api.types.is_numeric_dtype(df[coluna]):
-        return None
+@st.cache_data(show_spinner=False, max_entries=8)
+def correlacao_nulos(df: pd.DataFrame) -> pd.DataFrame:
+    """Correlação (Pearson) entre os padrões de nulos, via um único produto matricial"""
+    M = df.isna().to_numpy(dtype=np.float32)
+    n = M.shape[0]
+    
+    p = M.mean(axis=0, dtype=np.float64)
+    cov = (M.T @ M).astype(np.float64) / n - np.outer(p, p)
+    desvio = np.sqrt(p * (1 - p))
+    
+    # Colunas sem nulos (ou só nulos) não variam: correlação indefinida (NaN), como no pandas
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = cov / np.outer(desvio, desvio)
+    corr[np.outer(desvio, desvio) == 0] = np.nan
+    np.clip(corr, -1, 1, out=corr)
+    
+    return pd.DataFrame(corr, index=df.columns, columns=df.columns)
+
+
+def quantis_por_coluna(valores: np.ndarray, quantis: list, ordenado: bool = False) -> np.ndarray:
+    """
+    Quantis (interpolação linear) de cada coluna ignorando NaN, com uma única ordenação
+    Colunas sem valores válidos retornam NaN (nenhum outlier), como no pandas
+    Com ordenado=True, `valores` já vem ordenado por coluna e a ordenação é pulada
+    """
+    n_linhas, n_colunas = valores.shape
+    if n_linhas == 0:
+        return np.full((len(quantis), n_colunas), np.nan)
+    
+    ordenado = valores if ordenado else np.sort(valores, axis=0)  # NaN ficam no fim de cada coluna
+    n_validos = (~np.isnan(valores)).sum(axis=0)
+    
+    resultado = []
+    for q in quantis:
+        pos = q * np.maximum(n_validos - 1, 0)
+        i0 = np.floor(pos).astype(np.intp)
+        i1 = np.ceil(pos).astype(np.intp)
+        v0 = np.take_along_axis(ordenado, i0[np.newaxis, :], axis=0)[0]
+        v1 = np.take_along_axis(ordenado, i1[np.newaxis, :], axis=0)[0]
+        quantil = v0 + (v1 - v0) * (pos - i0)
+        quantil[n_validos == 0] = np.nan
+        resultado.append(quantil)
+    
+    return np.array(resultado)
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def analisar_outliers_todos(df: pd.DataFrame) -> dict:
+    """Detecta outliers (IQR) de todas as colunas numéricas em uma única passada"""
+    df_num = df.select_dtypes(include=['number'])
+    if df_num.shape[1] == 0:
+        return {}
     
-    Q1 = df[coluna].quantile(0.25)
-    Q3 = df[coluna].quantile(0.75)
+    ordenado = np.sort(df_num.to_numpy(dtype="float64", na_value=np.nan), axis=0)
+    n_validos = (~np.isnan(ordenado)).sum(axis=0)
+    
+    Q1, Q3 = quantis_por_coluna(ordenado, [0.25, 0.75], ordenado=True)
     IQR = Q3 - Q1
     
     lower_bound = Q1 - 1.5 * IQR
     upper_bound = Q3 + 1.5 * IQR
     
-    outliers = df[(df[coluna] < lower_bound) | (df[coluna] > upper_bound)]
+    # As contagens saem da mesma ordenação (busca binária), sem máscaras booleanas N x K
+    inferiores = np.zeros(len(n_validos), dtype=np.int64)
+    superiores = np.zeros(len(n_validos), dtype=np.int64)
+    for i, n in enumerate(n_validos):
+        if n:
+            coluna = ordenado[:n, i]
+            inferiores[i] = np.searchsorted(coluna, lower_bound[i], side='left')
+            superiores[i] = n - np.searchsorted(coluna, upper_bound[i], side='right')
+    total_outliers = inferiores + superiores
     
-    percentual = round((len(outliers) / len(df) * 100), 2) if len(df) > 0 else 0
+    percentuais = (total_outliers / len(df) * 100).round(2) if len(df) > 0 else np.zeros(len(total_outliers))
     
+    logger.info(f"🎯 Outliers (IQR) calculados para {df_num.shape[1]} colunas, {len(df):,} registros")
     return {
-        'total_outliers': len(outliers),
-        'percentual': percentual,
-        'lower_bound': float(lower_bound),
-        'upper_bound': float(upper_bound),
-        'outliers_inferiores': len(df[df[coluna] < lower_bound]),
-        'outliers_superiores': len(df[df[coluna] > upper_bound])
+        col: {
+            'total_outliers': int(total_outliers[i]),
+            'percentual': float(percentuais[i]),
+            'lower_bound': float(lower_bound[i]),
+            'upper_bound': float(upper_bound[i]),
+            'outliers_inferiores': int(inferiores[i]),
+            'outliers_superiores': int(superiores[i])
+        }
+        for i, col in enumerate(df_num.columns)
     }
 
 
+def analisar_outliers(df: pd.DataFrame, coluna: str) -> dict:
+    """Detecta outliers usando IQR (consulta o resultado de todas as colunas)"""
+    if not pd.api.types.is_numeric_dtype(df[coluna]):
+        return None
+    
+    return analisar_outliers_todos(df)[coluna]
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def calcular_estatisticas(df: pd.DataFrame, colunas: list) -> pd.DataFrame:
+    """
+    describe() enriquecido com assimetria, curtose, CV e nulos (uma linha por coluna)
+    Todas as reduções saem da mesma matriz, com as fórmulas (não viesadas) do pandas
+    """
+    valores = df[colunas].to_numpy(dtype=np.float64, na_value=np.nan)
+    validos = ~np.isnan(valores)
+    n = validos.sum(axis=0).astype(np.float64)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        media = np.nansum(valores, axis=0) / n
+        desvio = np.where(validos, valores - media, 0.0)
+        d2 = desvio * desvio
+        m2 = d2.sum(axis=0)
+        m3 = (d2 * desvio).sum(axis=0)
+        m4 = (d2 * d2).sum(axis=0)
+        
+        std = np.sqrt(m2 / (n - 1))
+        std[n < 2] = np.nan
+        
+        skew = (n * np.sqrt(n - 1) / (n - 2)) * (m3 / m2 ** 1.5)
+        skew[m2 == 0] = 0.0
+        skew[n < 3] = np.nan
+        
+        kurt = (n * (n + 1) * (n - 1) * m4) / ((n - 2) * (n - 3) * m2 ** 2) - 3 * (n - 1) ** 2 / ((n - 2) * (n - 3))
+        kurt[m2 == 0] = 0.0
+        kurt[n < 4] = np.nan
+        
+        minimo = np.where(n > 0, np.nanmin(np.where(validos, valores, np.inf), axis=0), np.nan)
+        maximo = np.where(n > 0, np.nanmax(np.where(validos, valores, -np.inf), axis=0), np.nan)
+        q25, q50, q75 = quantis_por_coluna(valores, [0.25, 0.50, 0.75])
+        
+        missing = len(df) - n.astype(np.int64)
+        stats = pd.DataFrame({
+            'count': n, 'mean': media, 'std': std, 'min': minimo,
+            '25%': q25, '50%': q50, '75%': q75, 'max': maximo,
+            'skewness': skew, 'kurtosis': kurt,
+            'cv': np.round(std / media * 100, 2),
+            'missing': missing,
+            'missing_%': np.round(missing / len(df) * 100, 2) if len(df) else np.nan,
+        }, index=pd.Index(colunas))
+    
+    logger.info(f"📈 Estatísticas calculadas: {len(colunas)} colunas, {len(df):,} registros")
+    return stats
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def contar_frequencias(serie: pd.Series) -> pd.Series:
+    """Frequência de cada valor presente (ordem decrescente); o tamanho é o nº de valores únicos"""
+    contagem = serie.value_counts()
+    return contagem[contagem > 0]  # category lista também as ausentes
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def calcular_medias_hibrido(df: pd.DataFrame, colunas: list) -> pd.DataFrame:
+    """Médias das colunas por híbrido (somas por código da categoria via np.bincount)"""
+    hibrido = df['hibrido'].astype('category')
+    codigos = hibrido.cat.codes.to_numpy()
+    com_hibrido = codigos >= 0
+    codigos = codigos[com_hibrido]
+    n_grupos = len(hibrido.cat.categories)
+    
+    presentes = np.bincount(codigos, minlength=n_grupos) > 0  # observed=True
+    medias = {}
+    for col in colunas:
+        valores = df[col].to_numpy(dtype=np.float64, na_value=np.nan)[com_hibrido]
+        validos = ~np.isnan(valores)
+        somas = np.bincount(codigos[validos], weights=valores[validos], minlength=n_grupos)
+        contagens = np.bincount(codigos[validos], minlength=n_grupos)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            medias[col] = (somas / contagens)[presentes]
+    
+    indice = pd.CategoricalIndex(hibrido.cat.categories[presentes], dtype=hibrido.dtype, name='hibrido')
+    return pd.DataFrame(medias, index=indice).round(2)
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def estatisticas_por_hibrido(df: pd.DataFrame, coluna: str) -> pd.DataFrame:
+    """Contagem, média, mediana, desvio, mínimo e máximo de uma coluna por híbrido (um único agrupamento)"""
+    stats = df.groupby('hibrido', observed=True, sort=False)[coluna].agg([
+        ('Contagem', 'count'),
+        ('Média', 'mean'),
+        ('Mediana', 'median'),
+        ('Desvio Padrão', 'std'),
+        ('Mínimo', 'min'),
+        ('Máximo', 'max')
+    ]).round(2).sort_index().reset_index()
+    stats.columns = ['Híbrido', 'Contagem', 'Média', 'Mediana', 'Desvio Padrão', 'Mínimo', 'Máximo']
+    return stats
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def calcular_correlacao(df: pd.DataFrame, colunas: list) -> pd.DataFrame:
+    """
+    Matriz de correlação (Pearson) entre as colunas, via produtos matriciais
+    Mantém a semântica do DataFrame.corr(): cada par usa as linhas em que ambos são válidos
+    """
+    valores = df[colunas].to_numpy(dtype=np.float64, na_value=np.nan)
+    validos = ~np.isnan(valores)
+    V = validos.astype(np.float64)
+    
+    # Centralizar antes reduz o cancelamento numérico nas somas
+    with np.errstate(divide='ignore', invalid='ignore'):
+        media = np.where(validos, valores, 0.0).sum(axis=0) / V.sum(axis=0)
+        X = np.where(validos, valores - media, 0.0)
+    
+    n = V.T @ V                      # linhas válidas em cada par
+    sx = X.T @ V                     # soma de x_i nas linhas válidas do par (i, j)
+    sxx = (X * X).T @ V
+    sxy = X.T @ X
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sxy - sx * sx.T / n
+        var = sxx - sx * sx / n
+        corr = cov / np.sqrt(var * var.T)
+    corr[(n < 2) | ~(var > 0) | ~(var.T > 0)] = np.nan
+    np.clip(corr, -1, 1, out=corr)
+    
+    return pd.DataFrame(corr, index=colunas, columns=colunas)
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def estrutura_colunas(df: pd.DataFrame) -> pd.DataFrame:
+    """Tipo, preenchimento e cardinalidade de cada coluna"""
+    nao_nulos = len(df) - nulos_por_coluna(df)
+    
+    return pd.DataFrame({
+        'Coluna': df.columns,
+        'Tipo': df.dtypes.astype(str).to_numpy(),
+        'Não Nulos': nao_nulos,
+        'Nulos': len(df) - nao_nulos,
+        '% Preenchido': (nao_nulos / len(df) * 100).round(1),
+        'Únicos': df.nunique().to_numpy()
+    })
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def gerar_csv(df: pd.DataFrame, index: bool = False) -> bytes:
+    """CSV para download (gerado apenas no clique e reaproveitado via cache)"""
+    buffer = BytesIO()  # escreve os bytes direto, sem a str intermediária do to_csv()
+    df.to_csv(buffer, index=index, encoding='utf-8')
+    return buffer.getvalue()
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def figura_radar_qualidade(completude: float, unicidade: float, consistencia_pct: float) -> go.Figure:
+    """Radar das três dimensões do score contra o score ideal"""
+    categorias = ['Completude', 'Unicidade', 'Consistência']
+    
+    fig = go.Figure()
+    
+    fig.add_trace(go.Scatterpolar(
+        r=[completude, unicidade, consistencia_pct],
+        theta=categorias,
+        fill='toself',
+        name='Score Atual',
+        line_color=PALETA_CORES['primary'],
+        fillcolor=PALETA_CORES['accent'],
+        opacity=0.6
+    ))
+    
+    fig.add_trace(go.Scatterpolar(
+        r=[100, 100, 100],
+        theta=categorias,
+        fill='toself',
+        name='Score Ideal',
+        line_color=PALETA_CORES['secondary'],
+        fillcolor=PALETA_CORES['success'],
+        opacity=0.3
+    ))
+    
+    fig.update_layout(
+        polar=dict(radialaxis=dict(visible=True, range=[0, 100])),
+        showlegend=True,
+        title="Qualidade por Dimensão",
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font=dict(color=PALETA_CORES['text_dark'])
+    )
+    return fig
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def figura_barras_nulos(analise_nulos: pd.DataFrame) -> go.Figure:
+    """Percentual de nulos por coluna"""
+    fig = px.bar(
+        analise_nulos,
+        x='Coluna',
+        y='Percentual',
+        title='Percentual de Valores Nulos por Coluna',
+        color='Percentual',
+        color_continuous_scale='Reds',
+        labels={'Percentual': 'Percentual de Nulos (%)'}
+    )
+    fig.update_layout(
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font=dict(color=PALETA_CORES['text_dark']),
+        xaxis_tickangle=-45
+    )
+    return fig
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def figura_correlacao_nulos(corr_nulos: pd.DataFrame) -> go.Figure:
+    """Heatmap da correlação entre padrões de nulos"""
+    fig = px.imshow(
+        corr_nulos,
+        text_auto='.2f',
+        aspect="auto",
+        color_continuous_scale='RdYlGn_r',
+        title="Correlação entre Padrões de Nulos"
+    )
+    fig.update_layout(
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font=dict(color=PALETA_CORES['text_dark'])
+    )
+    return fig
+
+
+def precisa_amostrar(df: pd.DataFrame, coluna_grupo: str = None,
+                     limite: int = GRAFICOS_OPTIONS["max_pontos_por_grupo"]) -> bool:
+    """Indica se algum grupo passa de `limite` linhas (só contagens, sem montar a amostra)"""
+    if len(df) <= limite:
+        return False
+    return not coluna_grupo or df[coluna_grupo].value_counts().max() > limite
+
+
+def amostrar_por_grupo(df: pd.DataFrame, coluna_grupo: str = None,
+                       limite: int = GRAFICOS_OPTIONS["max_pontos_por_grupo"]) -> pd.DataFrame:
+    """Amostra estratificada (no máximo `limite` linhas por grupo) para não enviar a base inteira ao navegador"""
+    if not precisa_amostrar(df, coluna_grupo, limite):
+        return df
+    
+    grupos = df[coluna_grupo] if coluna_grupo else pd.Series(0, index=df.index)
+    ordem = np.random.default_rng(0).permutation(len(df))
+    embaralhado, grupos = df.iloc[ordem], grupos.iloc[ordem]
+    manter = grupos.groupby(grupos, observed=True).cumcount().to_numpy() < limite
+    return embaralhado.loc[manter].sort_index()
+
+
+def resumo_box(valores: np.ndarray) -> dict:
+    """Quartis, limites dos bigodes (1,5 IQR) e outliers de um array sem NaN, no formato do go.Box"""
+    q1, mediana, q3 = np.percentile(valores, [25, 50, 75])
+    iqr = q3 - q1
+    fora = (valores < q1 - 1.5 * iqr) | (valores > q3 + 1.5 * iqr)
+    dentro = valores[~fora]
+    return dict(q1=[q1], median=[mediana], q3=[q3],
+                lowerfence=[dentro.min()], upperfence=[dentro.max()]), valores[fora].tolist()
+
+
+def figura_box(df: pd.DataFrame, coluna: str, titulo: str, coluna_grupo: str = None,
+               cores: list = px.colors.qualitative.Set3) -> go.Figure:
+    """
+    Box plot com pontos só nos outliers
+    Em bases grandes envia quartis/limites já calculados (e apenas os outliers) em vez de todas as linhas
+    """
+    if not precisa_amostrar(df, coluna_grupo):
+        if coluna_grupo:
+            return px.box(df, x=coluna_grupo, y=coluna, title=titulo, color=coluna_grupo,
+                          color_discrete_sequence=cores, points="outliers")
+        return px.box(df, y=coluna, title=titulo, color_discrete_sequence=cores, points="outliers")
+    
+    fig = go.Figure()
+    grupos = df.groupby(coluna_grupo, observed=True)[coluna] if coluna_grupo else [(coluna, df[coluna])]
+    for i, (nome, serie) in enumerate(grupos):
+        valores = serie.dropna().to_numpy(dtype=np.float64)
+        if len(valores) == 0:
+            continue
+        quartis, outliers = resumo_box(valores)
+        fig.add_trace(go.Box(
+            x=[nome] if coluna_grupo else None, name=str(nome), **quartis,
+            y=[outliers], boxpoints="all", jitter=0, pointpos=0,
+            marker_color=cores[i % len(cores)]
+        ))
+    fig.update_layout(title=titulo, showlegend=bool(coluna_grupo), xaxis_title=coluna_grupo, yaxis_title=coluna)
+    return fig
+
+
+def figura_histograma(df: pd.DataFrame, coluna: str, titulo: str, nbins: int, coluna_grupo: str = None,
+                      cores: list = px.colors.qualitative.Set3, marginal_box: bool = False) -> go.Figure:
+    """
+    Histograma (sobreposto por grupo, se houver)
+    Em bases grandes as contagens saem do np.histogram no servidor: o navegador recebe só as barras
+    """
+    if not precisa_amostrar(df, coluna_grupo):
+        return px.histogram(
+            df, x=coluna, nbins=nbins, title=titulo, color=coluna_grupo,
+            barmode='overlay', opacity=0.7 if coluna_grupo else None,
+            color_discrete_sequence=cores, marginal="box" if marginal_box else None
+        )
+    
+    valores = df[coluna].to_numpy(dtype=np.float64, na_value=np.nan)
+    validos = ~np.isnan(valores)
+    bordas = np.histogram_bin_edges(valores[validos], bins=nbins)
+    centros, larguras = (bordas[:-1] + bordas[1:]) / 2, np.diff(bordas)
+    
+    if marginal_box:
+        from plotly.subplots import make_subplots  # só usado neste caminho (bases grandes)
+        fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.2, 0.8], vertical_spacing=0.02)
+        quartis, outliers = resumo_box(valores[validos])
+        fig.add_trace(go.Box(
+            orientation='h', name=coluna, **quartis, x=[outliers],
+            boxpoints="all", jitter=0, pointpos=0, marker_color=cores[0], showlegend=False
+        ), row=1, col=1)
+        linha = dict(row=2, col=1)
+    else:
+        fig, linha = go.Figure(), {}
+    
+    if coluna_grupo:
+        codigos = df[coluna_grupo].astype('category')
+        grupos = [(nome, validos & (codigos == nome).to_numpy()) for nome in codigos.cat.categories]
+    else:
+        grupos = [(coluna, validos)]
+    
+    for i, (nome, mascara) in enumerate(grupos):
+        if not mascara.any():
+            continue
+        contagem, _ = np.histogram(valores[mascara], bins=bordas)
+        fig.add_trace(go.Bar(
+            x=centros, y=contagem, width=larguras, name=str(nome),
+            marker_color=cores[i % len(cores)], opacity=0.7 if coluna_grupo else None,
+            showlegend=bool(coluna_grupo)
+        ), **linha)
+    
+    fig.update_layout(title=titulo, barmode='overlay', bargap=0)
+    fig.update_xaxes(title_text=coluna, **linha)
+    fig.update_yaxes(title_text='count', **linha)
+    return fig
+
+
 def medalha(pos: int) -> str:
     """Retorna emoji de medalha baseado na posição"""
     if pos == 1:
@@ -206,87 +777,7 @@ def medalha(pos: int) -> str:
 def mostrar_explicacao_score():
     """Modal com explicação detalhada do cálculo do score"""
     
-    st.markdown("""
-    ## 🎯 Score de Qualidade Total (0-100 pontos)
-    
-    O score de qualidade é uma métrica composta que avalia três dimensões principais dos seus dados:
-    
-    ---
-    
-    ### 📊 1. Completude (60% do score - máx. 60 pts)
-    
-    **O que mede:** Percentual de valores preenchidos (não nulos) em todo o dataset.
-    
-    **Fórmula:**
-    
-    `Completude = (Total de Valores - Valores Nulos) / Total de Valores × 100`
-    
-    `Score Completude = Completude × 0.60`
-    
-    **Interpretação:**
-    - 🟢 **100%**: Todos os campos estão preenchidos
-    - 🟡 **80-99%**: Alguns campos vazios, mas aceitável
-    - 🔴 **< 80%**: Muitos dados faltantes, requer atenção
-    
-    ---
-    
-    ### 🔑 2. Unicidade (30% do score - máx. 30 pts)
-    
-    **O que mede:** Percentual de registros únicos (sem duplicatas).
-    
-    **Fórmula:**
-    
-    `Unicidade = (Total de Registros - Duplicatas) / Total de Registros × 100`
-    
-    `Score Unicidade = Unicidade × 0.30`
-    
-    **Interpretação:**
-    - 🟢 **100%**: Nenhuma duplicata encontrada
-    - 🟡 **95-99%**: Poucas duplicatas
-    - 🔴 **< 95%**: Muitas duplicatas, verificar dados
-    
-    ---
-    
-    ### ✓ 3. Consistência (10% do score - máx. 10 pts)
-    
-    **O que mede:** Variabilidade dos dados numéricos.
-    
-    **Fórmula:**
-    
-    `Score Consistência = 10 - (2 × número de colunas com desvio padrão = 0)`
-    
-    **Interpretação:**
-    - 🟢 **10 pts**: Todas as colunas têm variação natural
-    - 🟡 **6-8 pts**: Algumas colunas sem variação
-    - 🔴 **< 6 pts**: Muitas colunas constantes (possível erro)
-    
-    ---
-    
-    ### 🏆 Classificação Final
-    
-    | Score | Classificação | Significado |
-    |-------|---------------|-------------|
-    | 90-100 | 🟢 **Excelente** | Dados de alta qualidade, prontos para análise |
-    | 75-89 | 🟢 **Bom** | Dados confiáveis, pequenas melhorias possíveis |
-    | 60-74 | 🟡 **Regular** | Dados utilizáveis, mas requerem atenção |
-    | < 60 | 🔴 **Ruim** | Dados com problemas, necessitam correção |
-    
-    ---
-    
-    ### 💡 Dicas para Melhorar o Score
-    
-    1. **Completude baixa?** 
-       - Identifique colunas com muitos nulos
-       - Preencha valores faltantes ou remova colunas desnecessárias
-    
-    2. **Unicidade baixa?**
-       - Verifique registros duplicados
-       - Identifique a causa (importação duplicada, erro de sistema)
-    
-    3. **Consistência baixa?**
-       - Verifique colunas com valores constantes
-       - Pode indicar erro na coleta ou dados default
-    """)
+    st.markdown(EXPLICACAO_SCORE_MD)
     
     st.markdown("---")
     
@@ -299,13 +790,7 @@ def mostrar_explicacao_score():
 # ============================================================
 # CABEÇALHO
 # ============================================================
-st.markdown(f"""
-    <div style='background: linear-gradient(135deg, {PALETA_CORES['primary']} 0%, {PALETA_CORES['secondary']} 100%); 
-                padding: 2rem; border-radius: 10px; margin-bottom: 2rem; box-shadow: 0 4px 6px rgba(0,104,56,0.2);'>
-        <h1 style='color: white; margin: 0; text-shadow: 2px 2px 4px rgba(0,0,0,0.2);'>📊 Qualidade dos Dados</h1>
-        <p style='color: white; margin-top: 0.5rem; opacity: 0.95;'>Análise detalhada da completude e qualidade dos dados de produção</p>
-    </div>
-""", unsafe_allow_html=True)
+st.markdown(CABECALHO_HTML, unsafe_allow_html=True)
 
 criar_breadcrumb("Qualidade dos Dados")
 
@@ -317,16 +802,21 @@ if "df_final" not in st.session_state:
     st.warning("⚠️ Execute a página principal primeiro para carregar os dados.")
     st.stop()
 
-df = st.session_state["df_final"]
-df_raw = st.session_state.get("df_raw", df)
-df_filtrado = st.session_state.get("df_filtrado", df)
+# Tipos enxutos (float32/inteiros menores/category) reduzem a memória percorrida nas varreduras
+df = otimizar_tipos(st.session_state["df_final"])
+df_raw = otimizar_tipos(st.session_state.get("df_raw", df))
+df_filtrado = otimizar_tipos(st.session_state.get("df_filtrado", df))
+
+# Classificação das colunas em uma passada pelos dtypes, reaproveitada nas abas
+colunas_numericas_base, colunas_categoricas_base = classificar_colunas(df_filtrado)
 
 logger.info(f"📊 Página de Qualidade carregada: {len(df)} registros")
 
 # ============================================================
-# VISUALIZAÇÃO DOS DADOS (EXPANDER NO INÍCIO)
+# VISUALIZAÇÃO DOS DADOS (NO INÍCIO, SOB DEMANDA)
 # ============================================================
-with st.expander("📋 Ver Dados Utilizados nas Análises", expanded=False):
+def renderizar_dados_utilizados(df_filtrado: pd.DataFrame):
+    """Tabelas, downloads e estrutura do dataset usado nas análises"""
     
     st.markdown("##### 🗃️ Dataset Completo")
     st.caption(f"Exibindo {len(df_filtrado):,} registros e {len(df_filtrado.columns)} colunas")
@@ -338,38 +828,42 @@ with st.expander("📋 Ver Dados Utilizados nas Análises", expanded=False):
     ])
     
     with tab_dados1:
-        criar_aggrid(df_filtrado, altura=400, colunas_texto=['hibrido', 'safra'])
+        criar_aggrid(
+            df_filtrado, altura=400, colunas_texto=['hibrido', 'safra'],
+            max_linhas=AGGRID_OPTIONS["max_linhas_preview"]
+        )
         
         col_d1, col_d2 = st.columns(2)
         with col_d1:
             st.download_button(
                 label="📥 Download Completo (CSV)",
-                data=df_filtrado.to_csv(index=False).encode('utf-8'),
+                data=partial(gerar_csv, df_filtrado),
                 file_name="dados_completos.csv",
                 mime="text/csv",
                 use_container_width=True
             )
     
     with tab_dados2:
-        colunas_num = df_filtrado.select_dtypes(include=['number']).columns.tolist()
-        if 'safra' in colunas_num:
-            colunas_num.remove('safra')
+        colunas_num = list(colunas_numericas_base)
         
         colunas_exibir = []
         if 'hibrido' in df_filtrado.columns:
             colunas_exibir.append('hibrido')
         colunas_exibir.extend(colunas_num)
         
-        df_num = df_filtrado[colunas_exibir].copy()
+        df_num = df_filtrado[colunas_exibir]
         
         st.caption(f"📋 {len(colunas_num)} colunas numéricas disponíveis")
-        criar_aggrid(df_num, altura=400, colunas_texto=['hibrido'])
+        criar_aggrid(
+            df_num, altura=400, colunas_texto=['hibrido'],
+            max_linhas=AGGRID_OPTIONS["max_linhas_preview"]
+        )
         
         col_d1, col_d2 = st.columns(2)
         with col_d1:
             st.download_button(
                 label="📥 Download Numéricas (CSV)",
-                data=df_num.to_csv(index=False).encode('utf-8'),
+                data=partial(gerar_csv, df_num),
                 file_name="dados_numericos.csv",
                 mime="text/csv",
                 use_container_width=True
@@ -395,28 +889,16 @@ with st.expander("📋 Ver Dados Utilizados nas Análises", expanded=False):
         
         st.markdown("##### 📋 Estrutura das Colunas")
         
-        info_colunas = []
-        for col in df_filtrado.columns:
-            info_colunas.append({
-                'Coluna': col,
-                'Tipo': str(df_filtrado[col].dtype),
-                'Não Nulos': df_filtrado[col].notna().sum(),
-                'Nulos': df_filtrado[col].isna().sum(),
-                '% Preenchido': round(df_filtrado[col].notna().sum() / len(df_filtrado) * 100, 1),
-                'Únicos': df_filtrado[col].nunique()
-            })
-        
-        info_df = pd.DataFrame(info_colunas)
+        info_df = estrutura_colunas(df_filtrado)
         
-        criar_aggrid(info_df, altura=400, colunas_texto=['Coluna', 'Tipo'])
+        # Tabela pequena (uma linha por coluna): grid nativo, sem o custo de iniciar o AgGrid
+        st.dataframe(info_df, use_container_width=True, height=400, hide_index=True)
         
         st.markdown("---")
         
         st.markdown("##### 🔢 Colunas Numéricas Disponíveis")
         
-        colunas_numericas_info = df_filtrado.select_dtypes(include=['number']).columns.tolist()
-        if 'safra' in colunas_numericas_info:
-            colunas_numericas_info.remove('safra')
+        colunas_numericas_info = colunas_numericas_base
         
         if colunas_numericas_info:
             num_cols = 4
@@ -431,7 +913,7 @@ with st.expander("📋 Ver Dados Utilizados nas Análises", expanded=False):
         
         st.markdown("##### 📝 Colunas Categóricas")
         
-        colunas_categoricas = df_filtrado.select_dtypes(include=['object', 'category']).columns.tolist()
+        colunas_categoricas = colunas_categoricas_base
         
         if colunas_categoricas:
             num_cols = 4
@@ -442,6 +924,12 @@ with st.expander("📋 Ver Dados Utilizados nas Análises", expanded=False):
         else:
             st.info("ℹ️ Nenhuma coluna categórica encontrada.")
 
+
+# O corpo de um expander roda a cada rerun mesmo fechado; o toggle só renderiza quando ligado
+if st.toggle("📋 Ver Dados Utilizados nas Análises", value=False, key="mostrar_dados_utilizados"):
+    with st.container(border=True):
+        renderizar_dados_utilizados(df_filtrado)
+
 st.markdown("---")
 
 # ============================================================
@@ -503,10 +991,11 @@ st.markdown("### 📋 Resumo Executivo")
 
 col1, col2, col3, col4, col5 = st.columns(5)
 
+contagens = contar_nulos_duplicatas(df)
 total_valores = df.size
-valores_nulos = df.isnull().sum().sum()
-duplicatas = df.duplicated().sum()
-colunas_com_nulos = (df.isnull().sum() > 0).sum()
+valores_nulos = contagens["valores_nulos"]
+duplicatas = contagens["duplicatas"]
+colunas_com_nulos = contagens["colunas_com_nulos"]
 
 with col1:
     st.metric(label="📝 Total de Registros", value=f"{len(df):,}")
@@ -546,46 +1035,16 @@ st.markdown("---")
 # ============================================================
 st.markdown("### 📊 Análise Multidimensional de Qualidade")
 
-fig = go.Figure()
-
-categorias = ['Completude', 'Unicidade', 'Consistência']
-valores_radar = [
-    score_info['completude'],
-    score_info['unicidade'],
-    (score_info['score_consistencia'] / 10 * 100)
-]
-
-fig.add_trace(go.Scatterpolar(
-    r=valores_radar,
-    theta=categorias,
-    fill='toself',
-    name='Score Atual',
-    line_color=PALETA_CORES['primary'],
-    fillcolor=PALETA_CORES['accent'],
-    opacity=0.6
-))
-
-fig.add_trace(go.Scatterpolar(
-    r=[100, 100, 100],
-    theta=categorias,
-    fill='toself',
-    name='Score Ideal',
-    line_color=PALETA_CORES['secondary'],
-    fillcolor=PALETA_CORES['success'],
-    opacity=0.3
-))
-
-fig.update_layout(
-    polar=dict(radialaxis=dict(visible=True, range=[0, 100])),
-    showlegend=True,
-    title="Qualidade por Dimensão",
-    plot_bgcolor='white',
-    paper_bgcolor='white',
-    font=dict(color=PALETA_CORES['text_dark'])
+# Figura em cache: reruns sem mudança nos scores reaproveitam o mesmo objeto
+st.plotly_chart(
+    figura_radar_qualidade(
+        score_info['completude'],
+        score_info['unicidade'],
+        round(score_info['score_consistencia'] / 10 * 100, 1)
+    ),
+    use_container_width=True
 )
 
-st.plotly_chart(fig, use_container_width=True)
-
 st.markdown("---")
 
 # ============================================================
@@ -617,56 +1076,33 @@ with tab1:
         col1, col2 = st.columns([2, 1])
         
         with col1:
-            fig = px.bar(
-                analise_nulos,
-                x='Coluna',
-                y='Percentual',
-                title='Percentual de Valores Nulos por Coluna',
-                color='Percentual',
-                color_continuous_scale='Reds',
-                labels={'Percentual': 'Percentual de Nulos (%)'}
-            )
-            fig.update_layout(
-                plot_bgcolor='white',
-                paper_bgcolor='white',
-                font=dict(color=PALETA_CORES['text_dark']),
-                xaxis_tickangle=-45
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(figura_barras_nulos(analise_nulos), use_container_width=True)
         
         with col2:
             st.markdown("##### Top 5 Colunas com Mais Nulos")
-            for idx, row in analise_nulos.head(5).iterrows():
-                st.markdown(f"""
+            # Um único st.markdown para os cinco cards
+            cards_html = "".join(
+                f"""
                     <div style='background: white; padding: 1rem; border-radius: 6px; 
                                 margin-bottom: 0.5rem; border-left: 4px solid #dc3545;'>
-                        <strong>{row['Coluna']}</strong><br>
-                        <span style='color: #dc3545; font-size: 1.5rem;'>{row['Percentual']}%</span><br>
-                        <small>{row['Valores_Nulos']:,} valores nulos</small>
+                        <strong>{row.Coluna}</strong><br>
+                        <span style='color: #dc3545; font-size: 1.5rem;'>{row.Percentual}%</span><br>
+                        <small>{row.Valores_Nulos:,} valores nulos</small>
                     </div>
-                """, unsafe_allow_html=True)
+                """
+                for row in analise_nulos.head(5).itertuples(index=False)
+            )
+            st.markdown(cards_html, unsafe_allow_html=True)
         
         st.markdown("##### Detalhamento Completo")
-        criar_aggrid(analise_nulos, altura=400, colunas_texto=['Coluna'])
+        st.dataframe(analise_nulos, use_container_width=True, height=400, hide_index=True)
         
-        if len(df_filtrado.columns) > 1:
+        # Correlação só faz sentido com pelo menos duas colunas que tenham nulos
+        if len(analise_nulos) > 1:
             st.markdown("##### Matriz de Valores Nulos")
-            nulos_matrix = df_filtrado.isnull().astype(int)
-            corr_nulos = nulos_matrix.corr()
+            corr_nulos = correlacao_nulos(df_filtrado)
             
-            fig = px.imshow(
-                corr_nulos,
-                text_auto='.2f',
-                aspect="auto",
-                color_continuous_scale='RdYlGn_r',
-                title="Correlação entre Padrões de Nulos"
-            )
-            fig.update_layout(
-                plot_bgcolor='white',
-                paper_bgcolor='white',
-                font=dict(color=PALETA_CORES['text_dark'])
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(figura_correlacao_nulos(corr_nulos), use_container_width=True)
     else:
         st.success("✅ Excelente! Nenhum valor nulo encontrado nos dados!")
 
@@ -676,7 +1112,7 @@ with tab1:
 with tab2:
     st.markdown("#### Estatísticas Descritivas")
     
-    df_base_stats = df_filtrado.copy()
+    df_base_stats = df_filtrado
     
     col_filtro1, col_filtro2 = st.columns(2)
     
@@ -704,23 +1140,20 @@ with tab2:
                 )
             
             if hibridos_selecionados:
-                df_stats = df_base_stats[df_base_stats["hibrido"].isin(hibridos_selecionados)].copy()
+                df_stats = df_base_stats.loc[mascara_categorias(df_base_stats["hibrido"], hibridos_selecionados)]
             else:
-                df_stats = df_base_stats.copy()
+                df_stats = df_base_stats
                 st.warning("⚠️ Nenhum híbrido selecionado. Mostrando todos.")
                 hibridos_selecionados = hibridos_disponiveis
         else:
-            df_stats = df_base_stats.copy()
+            df_stats = df_base_stats
             st.info("ℹ️ Coluna 'hibrido' não encontrada.")
             hibridos_selecionados = []
     
     with col_filtro2:
         st.markdown("##### 📊 Selecionar Colunas Numéricas")
         
-        colunas_numericas_disponiveis = df_base_stats.select_dtypes(include=['number']).columns.tolist()
-        
-        if 'safra' in colunas_numericas_disponiveis:
-            colunas_numericas_disponiveis.remove('safra')
+        colunas_numericas_disponiveis = list(colunas_numericas_base)
         
         st.caption(f"📋 {len(colunas_numericas_disponiveis)} colunas numéricas disponíveis")
         
@@ -762,16 +1195,7 @@ with tab2:
         
         st.markdown("##### Resumo Estatístico")
         
-        stats = df_stats[colunas_selecionadas].describe().T
-        stats['skewness'] = df_stats[colunas_selecionadas].skew()
-        stats['kurtosis'] = df_stats[colunas_selecionadas].kurtosis()
-        stats['cv'] = (stats['std'] / stats['mean'] * 100).round(2)
-        stats['missing'] = df_stats[colunas_selecionadas].isnull().sum()
-        stats['missing_%'] = (stats['missing'] / len(df_stats) * 100).round(2)
-        
-        colunas_ordem = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max', 
-                        'skewness', 'kurtosis', 'cv', 'missing', 'missing_%']
-        stats = stats[[col for col in colunas_ordem if col in stats.columns]]
+        stats = calcular_estatisticas(df_stats, colunas_selecionadas)
         
         stats_display = stats.reset_index()
         stats_display.columns = ['Coluna'] + list(stats.columns)
@@ -784,7 +1208,7 @@ with tab2:
         
         st.download_button(
             label="📥 Download Estatísticas (CSV)",
-            data=stats.to_csv().encode('utf-8'),
+            data=partial(gerar_csv, stats, index=True),
             file_name="estatisticas_descritivas.csv",
             mime="text/csv"
         )
@@ -793,19 +1217,18 @@ with tab2:
         
         st.markdown("##### Coeficiente de Variação (CV%)")
         
-        cv_data = pd.DataFrame({
-            'Coluna': stats.index,
-            'CV': stats['cv'].values
-        }).sort_values('CV', ascending=False)
+        cv = stats['cv'].to_numpy()
+        ordem = np.argsort(-cv, kind='stable')  # decrescente, NaN no fim
+        cv_ordenado = cv[ordem]
         
-        fig = px.bar(
-            cv_data, x='Coluna', y='CV',
-            title='Coeficiente de Variação por Coluna',
-            color='CV', color_continuous_scale='Viridis',
-            labels={'CV': 'CV (%)'}, text='CV'
-        )
-        fig.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
+        fig = go.Figure(go.Bar(
+            x=stats.index.to_numpy()[ordem], y=cv_ordenado, text=cv_ordenado,
+            texttemplate='%{text:.1f}%', textposition='outside',
+            marker=dict(color=cv_ordenado, colorscale='Viridis', colorbar=dict(title='CV (%)'))
+        ))
         fig.update_layout(
+            title='Coeficiente de Variação por Coluna',
+            xaxis_title='Coluna', yaxis_title='CV (%)',
             plot_bgcolor='white', paper_bgcolor='white',
             font=dict(color=PALETA_CORES['text_dark']),
             xaxis_tickangle=-45, showlegend=False
@@ -833,10 +1256,9 @@ with tab2:
             col_comp1, col_comp2 = st.columns(2)
             
             with col_comp1:
-                fig_box = px.box(
-                    df_stats, x='hibrido', y=coluna_comparacao,
-                    title=f'Distribuição de {coluna_comparacao} por Híbrido',
-                    color='hibrido', color_discrete_sequence=px.colors.qualitative.Set3
+                fig_box = figura_box(
+                    df_stats, coluna_comparacao,
+                    f'Distribuição de {coluna_comparacao} por Híbrido', coluna_grupo='hibrido'
                 )
                 fig_box.update_layout(
                     plot_bgcolor='white', paper_bgcolor='white',
@@ -847,7 +1269,7 @@ with tab2:
             
             with col_comp2:
                 fig_violin = px.violin(
-                    df_stats, x='hibrido', y=coluna_comparacao,
+                    amostrar_por_grupo(df_stats, 'hibrido'), x='hibrido', y=coluna_comparacao,
                     title=f'Densidade de {coluna_comparacao} por Híbrido',
                     color='hibrido', box=True,
                     color_discrete_sequence=px.colors.qualitative.Set3
@@ -860,7 +1282,7 @@ with tab2:
                 st.plotly_chart(fig_violin, use_container_width=True)
             
             st.markdown("##### Médias por Híbrido")
-            medias_hibridos = df_stats.groupby('hibrido')[colunas_selecionadas].mean().round(2)
+            medias_hibridos = calcular_medias_hibrido(df_stats, colunas_selecionadas)
             
             medias_display = medias_hibridos.reset_index()
             medias_display.columns = ['Híbrido'] + list(medias_hibridos.columns)
@@ -869,7 +1291,7 @@ with tab2:
             
             st.download_button(
                 label="📥 Download Médias por Híbrido (CSV)",
-                data=medias_hibridos.to_csv().encode('utf-8'),
+                data=partial(gerar_csv, medias_hibridos, index=True),
                 file_name="medias_por_hibrido.csv",
                 mime="text/csv"
             )
@@ -909,7 +1331,7 @@ with tab2:
         if len(colunas_selecionadas) > 1:
             st.markdown("##### 🔗 Matriz de Correlação")
             
-            corr_matrix = df_stats[colunas_selecionadas].corr()
+            corr_matrix = calcular_correlacao(df_stats, colunas_selecionadas)
             
             fig_corr = px.imshow(
                 corr_matrix, text_auto='.2f', aspect="auto",
@@ -976,12 +1398,12 @@ with tab3:
                 )
             
             if hibridos_selecionados_dist:
-                df_dist = df_filtrado[df_filtrado["hibrido"].isin(hibridos_selecionados_dist)].copy()
+                df_dist = df_filtrado.loc[mascara_categorias(df_filtrado["hibrido"], hibridos_selecionados_dist)]
             else:
-                df_dist = df_filtrado.copy()
+                df_dist = df_filtrado
                 hibridos_selecionados_dist = hibridos_dist
         else:
-            df_dist = df_filtrado.copy()
+            df_dist = df_filtrado
             hibridos_selecionados_dist = []
     
     with col_filtro2:
@@ -1032,26 +1454,19 @@ with tab3:
             
             if comparar_hibridos:
                 if tipo_grafico == "Histograma":
-                    fig = px.histogram(
-                        df_dist, x=coluna_selecionada, 
-                        color='hibrido',
-                        nbins=30,
-                        title=f"Distribuição de {coluna_selecionada} por Híbrido",
-                        barmode='overlay',
-                        opacity=0.7,
-                        color_discrete_sequence=px.colors.qualitative.Set3
+                    fig = figura_histograma(
+                        df_dist, coluna_selecionada,
+                        f"Distribuição de {coluna_selecionada} por Híbrido",
+                        nbins=30, coluna_grupo='hibrido'
                     )
                 elif tipo_grafico == "Box Plot":
-                    fig = px.box(
-                        df_dist, x='hibrido', y=coluna_selecionada,
-                        title=f"Box Plot de {coluna_selecionada} por Híbrido",
-                        color='hibrido',
-                        color_discrete_sequence=px.colors.qualitative.Set3,
-                        points="outliers"
+                    fig = figura_box(
+                        df_dist, coluna_selecionada,
+                        f"Box Plot de {coluna_selecionada} por Híbrido", coluna_grupo='hibrido'
                     )
                 else:
                     fig = px.violin(
-                        df_dist, x='hibrido', y=coluna_selecionada,
+                        amostrar_por_grupo(df_dist, 'hibrido'), x='hibrido', y=coluna_selecionada,
                         title=f"Violin Plot de {coluna_selecionada} por Híbrido",
                         color='hibrido',
                         color_discrete_sequence=px.colors.qualitative.Set3,
@@ -1067,36 +1482,24 @@ with tab3:
                 
                 st.markdown("##### 📊 Estatísticas por Híbrido")
                 
-                stats_hibrido = df_dist.groupby('hibrido')[coluna_selecionada].agg([
-                    ('Contagem', 'count'),
-                    ('Média', 'mean'),
-                    ('Mediana', 'median'),
-                    ('Desvio Padrão', 'std'),
-                    ('Mínimo', 'min'),
-                    ('Máximo', 'max')
-                ]).round(2).reset_index()
-                stats_hibrido.columns = ['Híbrido', 'Contagem', 'Média', 'Mediana', 'Desvio Padrão', 'Mínimo', 'Máximo']
+                stats_hibrido = estatisticas_por_hibrido(df_dist, coluna_selecionada)
                 
                 criar_aggrid(stats_hibrido, altura=300, colunas_texto=['Híbrido'])
                 
             else:
                 if tipo_grafico == "Histograma":
-                    fig = px.histogram(
-                        df_dist, x=coluna_selecionada, nbins=50,
-                        title=f"Distribuição de {coluna_selecionada}",
-                        color_discrete_sequence=[PALETA_CORES['primary']],
-                        marginal="box"
+                    fig = figura_histograma(
+                        df_dist, coluna_selecionada, f"Distribuição de {coluna_selecionada}",
+                        nbins=50, cores=[PALETA_CORES['primary']], marginal_box=True
                     )
                 elif tipo_grafico == "Box Plot":
-                    fig = px.box(
-                        df_dist, y=coluna_selecionada,
-                        title=f"Box Plot de {coluna_selecionada}",
-                        color_discrete_sequence=[PALETA_CORES['secondary']],
-                        points="outliers"
+                    fig = figura_box(
+                        df_dist, coluna_selecionada, f"Box Plot de {coluna_selecionada}",
+                        cores=[PALETA_CORES['secondary']]
                     )
                 else:
                     fig = px.violin(
-                        df_dist, y=coluna_selecionada,
+                        amostrar_por_grupo(df_dist), y=coluna_selecionada,
                         title=f"Violin Plot de {coluna_selecionada}",
                         color_discrete_sequence=[PALETA_CORES['accent']],
                         box=True, points="outliers"
@@ -1110,22 +1513,24 @@ with tab3:
             
             st.markdown("##### 📈 Estatísticas Gerais")
             col_a, col_b, col_c, col_d, col_e, col_f = st.columns(6)
+            stats_coluna = calcular_estatisticas(df_dist, [coluna_selecionada]).loc[coluna_selecionada]
             
             with col_a:
-                st.metric("Contagem", f"{df_dist[coluna_selecionada].count():,}")
+                st.metric("Contagem", f"{int(stats_coluna['count']):,}")
             with col_b:
-                st.metric("Média", f"{df_dist[coluna_selecionada].mean():.2f}")
+                st.metric("Média", f"{stats_coluna['mean']:.2f}")
             with col_c:
-                st.metric("Mediana", f"{df_dist[coluna_selecionada].median():.2f}")
+                st.metric("Mediana", f"{stats_coluna['50%']:.2f}")
             with col_d:
-                st.metric("Desvio Padrão", f"{df_dist[coluna_selecionada].std():.2f}")
+                st.metric("Desvio Padrão", f"{stats_coluna['std']:.2f}")
             with col_e:
-                st.metric("Assimetria", f"{df_dist[coluna_selecionada].skew():.2f}")
+                st.metric("Assimetria", f"{stats_coluna['skewness']:.2f}")
             with col_f:
-                st.metric("Curtose", f"{df_dist[coluna_selecionada].kurtosis():.2f}")
+                st.metric("Curtose", f"{stats_coluna['kurtosis']:.2f}")
         
         else:
-            value_counts = df_dist[coluna_selecionada].value_counts().head(20)
+            frequencias = contar_frequencias(df_dist[coluna_selecionada])
+            value_counts = frequencias.head(20)
             
             fig = px.bar(
                 x=value_counts.index, y=value_counts.values,
@@ -1157,7 +1562,7 @@ with tab3:
             
             col_a, col_b, col_c = st.columns(3)
             with col_a:
-                st.metric("Valores Únicos", df_dist[coluna_selecionada].nunique())
+                st.metric("Valores Únicos", len(frequencias))
             with col_b:
                 st.metric("Mais Frequente", str(value_counts.index[0]) if len(value_counts) > 0 else "N/A")
             with col_c:
@@ -1171,10 +1576,7 @@ with tab3:
 with tab4:
     st.markdown("#### Detecção de Outliers")
     
-    colunas_numericas = df_filtrado.select_dtypes(include=['number']).columns.tolist()
-    
-    if 'safra' in colunas_numericas:
-        colunas_numericas.remove('safra')
+    colunas_numericas = list(colunas_numericas_base)
     
     if colunas_numericas:
         coluna_outlier = st.selectbox(
@@ -1218,20 +1620,22 @@ with tab4:
             if outlier_info['total_outliers'] > 0:
                 st.markdown("##### Registros com Outliers")
                 
-                outliers_df = df_filtrado[
-                    (df_filtrado[coluna_outlier] < outlier_info['lower_bound']) |
-                    (df_filtrado[coluna_outlier] > outlier_info['upper_bound'])
-                ].copy()
+                valores_outlier = df_filtrado[coluna_outlier].to_numpy()
+                abaixo = valores_outlier < outlier_info['lower_bound']
+                mascara_outliers = abaixo | (valores_outlier > outlier_info['upper_bound'])
                 
-                outliers_df['Tipo_Outlier'] = outliers_df[coluna_outlier].apply(
-                    lambda x: 'Inferior' if x < outlier_info['lower_bound'] else 'Superior'
+                # Rótulo de 2 categorias a partir de códigos int8 (0 = Inferior, 1 = Superior)
+                outliers_df = df_filtrado.loc[mascara_outliers].assign(
+                    Tipo_Outlier=pd.Categorical.from_codes(
+                        (~abaixo[mascara_outliers]).astype(np.int8), categories=['Inferior', 'Superior']
+                    )
                 )
                 
                 criar_aggrid(outliers_df, altura=300)
                 
                 st.download_button(
                     label="📥 Download Outliers (CSV)",
-                    data=outliers_df.to_csv(index=False).encode('utf-8'),
+                    data=partial(gerar_csv, outliers_df),
                     file_name=f"outliers_{coluna_outlier}.csv",
                     mime="text/csv"
                 )
@@ -1258,7 +1662,9 @@ with tab5:
         with col1:
             st.markdown("##### 🔹 Dados Originais")
             
+            # Score e contagens vêm dos caches por conteúdo: acompanham df_raw quando a planilha é relida
             score_raw = calcular_score_qualidade(df_raw)
+            contagens_raw = contar_nulos_duplicatas(df_raw)
             quality_raw, color_raw = get_quality_class(score_raw['score_total'])
             
             st.markdown(f"""
@@ -1270,13 +1676,14 @@ with tab5:
             
             st.metric("Registros", f"{len(df_raw):,}")
             st.metric("Completude", f"{score_raw['completude']:.2f}%")
-            st.metric("Valores Nulos", f"{df_raw.isnull().sum().sum():,}")
-            st.metric("Duplicatas", f"{df_raw.duplicated().sum():,}")
+            st.metric("Valores Nulos", f"{contagens_raw['valores_nulos']:,}")
+            st.metric("Duplicatas", f"{contagens_raw['duplicatas']:,}")
         
         with col2:
             st.markdown("##### 🔹 Dados Filtrados")
             
             score_filt = calcular_score_qualidade(df_filtrado)
+            contagens_filt = contar_nulos_duplicatas(df_filtrado)
             quality_filt, color_filt = get_quality_class(score_filt['score_total'])
             
             st.markdown(f"""
@@ -1288,26 +1695,24 @@ with tab5:
             
             delta_registros = len(df_filtrado) - len(df_raw)
             delta_completude = score_filt['completude'] - score_raw['completude']
-            delta_nulos = df_filtrado.isnull().sum().sum() - df_raw.isnull().sum().sum()
-            delta_duplicatas = df_filtrado.duplicated().sum() - df_raw.duplicated().sum()
+            delta_nulos = contagens_filt['valores_nulos'] - contagens_raw['valores_nulos']
+            delta_duplicatas = contagens_filt['duplicatas'] - contagens_raw['duplicatas']
             
             st.metric("Registros", f"{len(df_filtrado):,}", delta=f"{delta_registros:,}")
             st.metric("Completude", f"{score_filt['completude']:.2f}%", delta=f"{delta_completude:+.2f}%")
-            st.metric("Valores Nulos", f"{df_filtrado.isnull().sum().sum():,}", delta=f"{delta_nulos:,}")
-            st.metric("Duplicatas", f"{df_filtrado.duplicated().sum():,}", delta=f"{delta_duplicatas:,}")
+            st.metric("Valores Nulos", f"{contagens_filt['valores_nulos']:,}", delta=f"{delta_nulos:,}")
+            st.metric("Duplicatas", f"{contagens_filt['duplicatas']:,}", delta=f"{delta_duplicatas:,}")
         
         st.markdown("##### Comparação Visual dos Scores")
         
-        comparacao = pd.DataFrame({
-            'Tipo': ['Original', 'Filtrado', 'Original', 'Filtrado', 'Original', 'Filtrado'],
-            'Dimensão': ['Completude', 'Completude', 'Unicidade', 'Unicidade', 'Consistência', 'Consistência'],
-            'Score': [
-                score_raw['completude'], score_filt['completude'],
-                score_raw['unicidade'], score_filt['unicidade'],
-                (score_raw['score_consistencia'] / 10 * 100),
-                (score_filt['score_consistencia'] / 10 * 100)
-            ]
-        })
+        comparacao = pd.DataFrame.from_records([
+            ('Original', 'Completude', score_raw['completude']),
+            ('Filtrado', 'Completude', score_filt['completude']),
+            ('Original', 'Unicidade', score_raw['unicidade']),
+            ('Filtrado', 'Unicidade', score_filt['unicidade']),
+            ('Original', 'Consistência', score_raw['score_consistencia'] / 10 * 100),
+            ('Filtrado', 'Consistência', score_filt['score_consistencia'] / 10 * 100),
+        ], columns=['Tipo', 'Dimensão', 'Score'])
         
         fig = px.bar(
             comparacao, x='Dimensão', y='Score', color='Tipo', barmode='group',
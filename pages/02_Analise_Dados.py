@@ -12,79 +12,261 @@ import plotly.graph_objects as go
 import numpy as np
 import sys
 from pathlib import Path
-from scipy import stats
+from functools import partial
+from io import BytesIO
+from scipy.special import ndtr
 
 # Adicionar diretório raiz ao path para importar módulos
 sys.path.append(str(Path(__file__).parent.parent))
 
-from config import PALETA_CORES
-from utils import criar_breadcrumb, criar_aggrid, logger
+from config import PALETA_CORES, AGGRID_OPTIONS
+from utils import (criar_breadcrumb, criar_aggrid, categorias_presentes, preencher_template,
+                   mascara_categorias, reduzir_tipos_numericos, logger)
 
 # ============================================================
-# CONFIGURAÇÃO DA PÁGINA
-# ============================================================
-st.set_page_config(
-    page_title="Análise de Dados",
-    page_icon="📈",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-# ============================================================
-# CSS CUSTOMIZADO
+# CONTEÚDO ESTÁTICO (CSS E CABEÇALHO)
 # ============================================================
-st.markdown(f"""
+CSS_TEMPLATE = """
     <style>
-    .main {{
-        background-color: {PALETA_CORES['bg_light']};
-    }}
+    .main {
+        background-color: ${bg_light};
+    }
     
-    .metric-card {{
+    .metric-card {
         background: white;
         padding: 1.5rem;
         border-radius: 10px;
         box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        border-left: 4px solid {PALETA_CORES['secondary']};
+        border-left: 4px solid ${secondary};
         margin-bottom: 1rem;
-    }}
+    }
     
-    .section-header {{
+    .section-header {
         background: white;
         padding: 1rem 1.5rem;
         border-radius: 8px;
         margin: 1.5rem 0 1rem 0;
-        border-left: 4px solid {PALETA_CORES['accent']};
+        border-left: 4px solid ${accent};
         box-shadow: 0 1px 3px rgba(0,0,0,0.1);
-    }}
+    }
     
-    .section-title {{
-        color: {PALETA_CORES['primary']};
+    .section-title {
+        color: ${primary};
         font-size: 1.5rem;
         font-weight: 600;
         margin: 0;
-    }}
+    }
     
-    .stTabs [data-baseweb="tab-list"] {{
+    .stTabs [data-baseweb="tab-list"] {
         gap: 12px;
         background-color: white;
         padding: 0.75rem;
         border-radius: 8px;
-    }}
+    }
     
-    .stTabs [data-baseweb="tab"] {{
-        background-color: {PALETA_CORES['bg_light']};
+    .stTabs [data-baseweb="tab"] {
+        background-color: ${bg_light};
         border-radius: 6px;
-        color: {PALETA_CORES['primary']};
+        color: ${primary};
         font-weight: 500;
         padding: 0.75rem 1.5rem !important;
-    }}
+    }
     
-    .stTabs [aria-selected="true"] {{
-        background: linear-gradient(135deg, {PALETA_CORES['primary']} 0%, {PALETA_CORES['secondary']} 100%);
+    .stTabs [aria-selected="true"] {
+        background: linear-gradient(135deg, ${primary} 0%, ${secondary} 100%);
         color: white;
-    }}
+    }
     </style>
-""", unsafe_allow_html=True)
+"""
+
+CSS_PAGINA = preencher_template(CSS_TEMPLATE, **PALETA_CORES)
+
+CABECALHO_TEMPLATE = """
+    <div style='background: linear-gradient(135deg, ${primary} 0%, ${secondary} 100%); 
+                padding: 2rem; border-radius: 10px; margin-bottom: 2rem; box-shadow: 0 4px 6px rgba(0,104,56,0.2);'>
+        <h1 style='color: white; margin: 0; text-shadow: 2px 2px 4px rgba(0,0,0,0.2);'>📈 Análise de Dados</h1>
+        <p style='color: white; margin-top: 0.5rem; opacity: 0.95;'>Análise exploratória e visualizações avançadas dos dados de produção</p>
+    </div>
+"""
+
+CABECALHO_HTML = preencher_template(CABECALHO_TEMPLATE, **PALETA_CORES)
+
+# ============================================================
+# CONFIGURAÇÃO DA PÁGINA
+# ============================================================
+st.set_page_config(
+    page_title="Análise de Dados",
+    page_icon="📈",
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
+
+# ============================================================
+# CSS CUSTOMIZADO
+# ============================================================
+st.markdown(CSS_PAGINA, unsafe_allow_html=True)
+
+# ============================================================
+# FUNÇÕES AUXILIARES
+# ============================================================
+@st.cache_data(show_spinner=False, max_entries=8)
+def otimizar_tipos(df: pd.DataFrame) -> pd.DataFrame:
+    """Garante medições em float32 e hibrido/macro_mkt como category (no-op para a base do app)"""
+    df = reduzir_tipos_numericos(df.copy(deep=False))
+    for col in ['hibrido', 'macro_mkt']:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def gerar_csv(df: pd.DataFrame) -> bytes:
+    """CSV para download (gerado apenas no clique e reaproveitado via cache)"""
+    buffer = BytesIO()  # escreve os bytes direto, sem a str intermediária do to_csv()
+    df.to_csv(buffer, index=False, encoding='utf-8')
+    return buffer.getvalue()
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def classificar_colunas(df: pd.DataFrame) -> tuple:
+    """Retorna (colunas numéricas exceto safra, colunas texto/categóricas)"""
+    numericas = [c for c in df.select_dtypes(include=['number']).columns if c != 'safra']
+    categoricas = df.select_dtypes(include=['object', 'category']).columns.tolist()
+    return numericas, categoricas
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def estrutura_colunas(df: pd.DataFrame) -> pd.DataFrame:
+    """Tipo, preenchimento e cardinalidade de cada coluna (reduções vetorizadas, sem laço por coluna)"""
+    nao_nulos = df.notna().sum().to_numpy()
+    
+    return pd.DataFrame({
+        'Coluna': df.columns,
+        'Tipo': df.dtypes.astype(str).to_numpy(),
+        'Não Nulos': nao_nulos,
+        'Nulos': len(df) - nao_nulos,
+        '% Preenchido': (nao_nulos / len(df) * 100).round(1),
+        'Únicos': df.nunique().to_numpy()
+    })
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def figura_strip(df_analise: pd.DataFrame, coluna_producao: str, rotulo_producao: str, medias_hibrido: pd.Series,
+                 media_geral: float, n_hibridos: int, mostrar_rotulos: bool) -> go.Figure:
+    """Strip plot da produção por híbrido (pontos com jitter + quadro de médias)"""
+    ordem_hibridos = medias_hibrido.index.tolist()
+    tem_cidade = 'cidade_cod3' in df_analise.columns
+    
+    # Preparar dados com jitter manual no eixo Y (arrays soltos, sem copiar df_analise)
+    # Posição de cada híbrido na ordem do gráfico = código da categoria (-1 fora da ordem)
+    hibrido_num = pd.Categorical(df_analise['hibrido'], categories=ordem_hibridos).codes
+    
+    # Adicionar jitter (gerador local com semente fixa: reprodutível e sem tocar o estado global do numpy,
+    # compartilhado entre as sessões do servidor); float32 em [-0.3, 0.3), ajustado no próprio buffer
+    jitter = np.random.default_rng(42).random(len(hibrido_num), dtype=np.float32)
+    jitter *= 0.6
+    jitter -= 0.3
+    hibrido_jitter = hibrido_num + jitter
+    
+    plotaveis = hibrido_num >= 0
+    indice_hibrido = hibrido_num[plotaveis]
+    hibrido_jitter = hibrido_jitter[plotaveis]
+    valores_producao = df_analise[coluna_producao].to_numpy()[plotaveis]
+    hibridos_pontos = df_analise['hibrido'].astype(str).to_numpy()[plotaveis]
+    if tem_cidade:
+        cidades_pontos = df_analise['cidade_cod3'].astype(str).to_numpy()[plotaveis]
+    
+    # Criar figura
+    fig = go.Figure()
+    
+    # Cores
+    cores = px.colors.qualitative.Set2
+    
+    # Todos os pontos em um único trace WebGL (cor por híbrido via array), médias em um segundo trace
+    cores_hibridos = np.array(cores)[np.arange(len(ordem_hibridos)) % len(cores)]
+    
+    if tem_cidade:
+        customdata = np.column_stack([cidades_pontos, hibridos_pontos])
+        hover_pontos = (
+            "<b>%{customdata[0]}</b><br>" + rotulo_producao
+            + ": %{x:,.1f}<br>Híbrido: %{customdata[1]}<extra></extra>"
+        )
+    else:
+        customdata = hibridos_pontos
+        hover_pontos = rotulo_producao + ": %{x:,.1f}<br>Híbrido: %{customdata}<extra></extra>"
+    
+    fig.add_trace(go.Scattergl(
+        x=valores_producao,
+        y=hibrido_jitter,
+        mode='markers+text' if mostrar_rotulos and tem_cidade else 'markers',
+        text=cidades_pontos if mostrar_rotulos and tem_cidade else None,
+        textposition='top center',
+        textfont=dict(size=8, color='black'),
+        marker=dict(
+            size=10,
+            color=cores_hibridos[indice_hibrido],
+            opacity=0.7,
+            line=dict(width=1, color='white')
+        ),
+        customdata=customdata,
+        hovertemplate=hover_pontos
+    ))
+    
+    # Quadros com a média de cada híbrido
+    fig.add_trace(go.Scatter(
+        x=medias_hibrido.to_numpy(),
+        y=np.arange(len(ordem_hibridos)),
+        mode='markers+text',
+        texttemplate='%{x:,.0f}',
+        textposition='middle center',
+        textfont=dict(size=9, color='white', family='Arial Black'),
+        marker=dict(
+            size=40,
+            color=cores_hibridos,
+            symbol='square',
+            opacity=0.9,
+            line=dict(width=2, color='white')
+        ),
+        customdata=np.asarray(ordem_hibridos, dtype=str),
+        hovertemplate="<b>Média %{customdata}</b><br>" + rotulo_producao + ": %{x:,.1f}<extra></extra>",
+        showlegend=False
+    ))
+    
+    # Adicionar linha de média geral (referência)
+    fig.add_vline(
+        x=media_geral,
+        line_dash="dash",
+        line_color="red",
+        line_width=2,
+        annotation_text=f"Média Geral: {media_geral:,.1f}",
+        annotation_position="top"
+    )
+    
+    # Layout
+    fig.update_layout(
+        title=f"Distribuição de {rotulo_producao} por Híbrido",
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font=dict(color=PALETA_CORES['text_dark']),
+        showlegend=False,
+        height=max(500, n_hibridos * 45),
+        xaxis=dict(
+            title=rotulo_producao,
+            gridcolor='lightgray',
+            gridwidth=0.5
+        ),
+        yaxis=dict(
+            title="",
+            tickmode='array',
+            tickvals=list(range(len(ordem_hibridos))),
+            ticktext=ordem_hibridos,
+            gridcolor='lightgray',
+            gridwidth=0.5
+        )
+    )
+    
+    return fig
+
 
 # ============================================================
 # MODAL DE EXPLICAÇÃO DA PROBABILIDADE
@@ -194,13 +376,7 @@ def mostrar_explicacao_probabilidade():
 # ============================================================
 # CABEÇALHO
 # ============================================================
-st.markdown(f"""
-    <div style='background: linear-gradient(135deg, {PALETA_CORES['primary']} 0%, {PALETA_CORES['secondary']} 100%); 
-                padding: 2rem; border-radius: 10px; margin-bottom: 2rem; box-shadow: 0 4px 6px rgba(0,104,56,0.2);'>
-        <h1 style='color: white; margin: 0; text-shadow: 2px 2px 4px rgba(0,0,0,0.2);'>📈 Análise de Dados</h1>
-        <p style='color: white; margin-top: 0.5rem; opacity: 0.95;'>Análise exploratória e visualizações avançadas dos dados de produção</p>
-    </div>
-""", unsafe_allow_html=True)
+st.markdown(CABECALHO_HTML, unsafe_allow_html=True)
 
 criar_breadcrumb("Análise de Dados")
 
@@ -212,16 +388,18 @@ if "df_final" not in st.session_state:
     st.warning("⚠️ Execute a página principal primeiro para carregar os dados.")
     st.stop()
 
-df = st.session_state["df_final"]
+df = otimizar_tipos(st.session_state["df_final"])
 df_raw = st.session_state.get("df_raw", df)
-df_filtrado = st.session_state.get("df_filtrado", df)
+df_filtrado = otimizar_tipos(st.session_state.get("df_filtrado", df))
+colunas_numericas_base, colunas_categoricas_base = classificar_colunas(df_filtrado)
 
 logger.info(f"📈 Página de Análise carregada: {len(df)} registros")
 
 # ============================================================
-# VISUALIZAÇÃO DOS DADOS (EXPANDER NO INÍCIO)
+# VISUALIZAÇÃO DOS DADOS (NO INÍCIO, SOB DEMANDA)
 # ============================================================
-with st.expander("📋 Ver Dados Utilizados nas Análises", expanded=False):
+def renderizar_dados_utilizados(df_filtrado: pd.DataFrame):
+    """Tabelas, downloads e estrutura do dataset usado nas análises"""
     
     st.markdown("##### 🗃️ Dataset Completo")
     st.caption(f"Exibindo {len(df_filtrado):,} registros e {len(df_filtrado.columns)} colunas")
@@ -233,111 +411,300 @@ with st.expander("📋 Ver Dados Utilizados nas Análises", expanded=False):
     ])
     
     with tab_dados1:
-        criar_aggrid(df_filtrado, altura=400, colunas_texto=['hibrido', 'safra'])
+        criar_aggrid(df_filtrado, altura=400, colunas_texto=['hibrido', 'safra'],
+                     max_linhas=AGGRID_OPTIONS["max_linhas_preview"])
         
         col_d1, col_d2 = st.columns(2)
         with col_d1:
             st.download_button(
                 label="📥 Download Completo (CSV)",
-                data=df_filtrado.to_csv(index=False).encode('utf-8'),
+                data=partial(gerar_csv, df_filtrado),
                 file_name="dados_completos.csv",
                 mime="text/csv",
                 use_container_width=True
             )
     
     with tab_dados2:
-        colunas_num = df_filtrado.select_dtypes(include=['number']).columns.tolist()
-        if 'safra' in colunas_num:
-            colunas_num.remove('safra')
-        
-        colunas_exibir = []
-        if 'hibrido' in df_filtrado.columns:
-            colunas_exibir.append('hibrido')
-        colunas_exibir.extend(colunas_num)
-        
-        df_num = df_filtrado[colunas_exibir].copy()
-        
-        st.caption(f"📋 {len(colunas_num)} colunas numéricas disponíveis")
-        criar_aggrid(df_num, altura=400, colunas_texto=['hibrido'])
-        
-        col_d1, col_d2 = st.columns(2)
-        with col_d1:
-            st.download_button(
-                label="📥 Download Numéricas (CSV)",
-                data=df_num.to_csv(index=False).encode('utf-8'),
-                file_name="dados_numericos.csv",
-                mime="text/csv",
-                use_container_width=True
-            )
+        if not carregamento_liberado("dados_numericas_carregados", "🔢 Carregar colunas numéricas"):
+            st.caption("As colunas numéricas são montadas apenas quando solicitadas.")
+        else:
+            renderizar_dados_numericos(df_filtrado)
     
     with tab_dados3:
-        st.markdown("##### 📊 Resumo do Dataset")
-        
-        col_i1, col_i2, col_i3, col_i4 = st.columns(4)
-        
-        with col_i1:
-            st.metric("Total de Registros", f"{len(df_filtrado):,}")
-        with col_i2:
-            st.metric("Total de Colunas", len(df_filtrado.columns))
-        with col_i3:
-            valores_nulos_total = df_filtrado.isnull().sum().sum()
-            st.metric("Valores Nulos", f"{valores_nulos_total:,}")
-        with col_i4:
-            completude_total = ((df_filtrado.size - valores_nulos_total) / df_filtrado.size * 100)
-            st.metric("Completude", f"{completude_total:.1f}%")
-        
-        st.markdown("---")
-        
-        st.markdown("##### 📋 Estrutura das Colunas")
-        
-        info_colunas = []
-        for col in df_filtrado.columns:
-            info_colunas.append({
-                'Coluna': col,
-                'Tipo': str(df_filtrado[col].dtype),
-                'Não Nulos': df_filtrado[col].notna().sum(),
-                'Nulos': df_filtrado[col].isna().sum(),
-                '% Preenchido': round(df_filtrado[col].notna().sum() / len(df_filtrado) * 100, 1),
-                'Únicos': df_filtrado[col].nunique()
-            })
-        
-        info_df = pd.DataFrame(info_colunas)
-        
-        criar_aggrid(info_df, altura=400, colunas_texto=['Coluna', 'Tipo'])
-        
-        st.markdown("---")
-        
-        st.markdown("##### 🔢 Colunas Numéricas Disponíveis")
-        
-        colunas_numericas_info = df_filtrado.select_dtypes(include=['number']).columns.tolist()
-        if 'safra' in colunas_numericas_info:
-            colunas_numericas_info.remove('safra')
-        
-        if colunas_numericas_info:
-            num_cols = 4
-            cols = st.columns(num_cols)
-            for i, col_name in enumerate(colunas_numericas_info):
-                with cols[i % num_cols]:
-                    st.markdown(f"✅ `{col_name}`")
+        if not carregamento_liberado("dados_info_carregados", "ℹ️ Carregar informações"):
+            st.caption("O resumo e a estrutura das colunas são calculados apenas quando solicitados.")
         else:
-            st.warning("⚠️ Nenhuma coluna numérica encontrada.")
+            renderizar_informacoes(df_filtrado)
+
+
+def carregamento_liberado(chave: str, rotulo: str) -> bool:
+    """Abas pesadas renderizam o corpo mesmo sem foco; só libera após o clique (guardado no session_state)"""
+    if not st.session_state.get(chave, False):
+        if not st.button(rotulo, key=f"botao_{chave}"):
+            return False
+        st.session_state[chave] = True
+    return True
+
+
+def renderizar_dados_numericos(df_filtrado: pd.DataFrame):
+    """Grid e download apenas das colunas numéricas"""
+    colunas_num = list(colunas_numericas_base)
+    
+    colunas_exibir = []
+    if 'hibrido' in df_filtrado.columns:
+        colunas_exibir.append('hibrido')
+    colunas_exibir.extend(colunas_num)
+    
+    df_num = df_filtrado[colunas_exibir]
+    
+    st.caption(f"📋 {len(colunas_num)} colunas numéricas disponíveis")
+    criar_aggrid(df_num, altura=400, colunas_texto=['hibrido'],
+                 max_linhas=AGGRID_OPTIONS["max_linhas_preview"])
+    
+    col_d1, col_d2 = st.columns(2)
+    with col_d1:
+        st.download_button(
+            label="📥 Download Numéricas (CSV)",
+            data=partial(gerar_csv, df_num),
+            file_name="dados_numericos.csv",
+            mime="text/csv",
+            use_container_width=True
+        )
+
+
+def renderizar_informacoes(df_filtrado: pd.DataFrame):
+    """Resumo, estrutura e classificação das colunas"""
+    # Uma única contagem de não nulos por coluna alimenta as métricas e a tabela de estrutura
+    info_df = estrutura_colunas(df_filtrado)
+    
+    st.markdown("##### 📊 Resumo do Dataset")
+    
+    col_i1, col_i2, col_i3, col_i4 = st.columns(4)
+    
+    with col_i1:
+        st.metric("Total de Registros", f"{len(df_filtrado):,}")
+    with col_i2:
+        st.metric("Total de Colunas", len(df_filtrado.columns))
+    with col_i3:
+        valores_nulos_total = int(info_df['Nulos'].sum())
+        st.metric("Valores Nulos", f"{valores_nulos_total:,}")
+    with col_i4:
+        completude_total = ((df_filtrado.size - valores_nulos_total) / df_filtrado.size * 100)
+        st.metric("Completude", f"{completude_total:.1f}%")
+    
+    st.markdown("---")
+    
+    st.markdown("##### 📋 Estrutura das Colunas")
+    
+    criar_aggrid(info_df, altura=400, colunas_texto=['Coluna', 'Tipo'])
+    
+    st.markdown("---")
+    
+    st.markdown("##### 🔢 Colunas Numéricas Disponíveis")
+    
+    colunas_numericas_info = colunas_numericas_base
+    
+    if colunas_numericas_info:
+        num_cols = 4
+        cols = st.columns(num_cols)
+        for i, col_name in enumerate(colunas_numericas_info):
+            with cols[i % num_cols]:
+                st.markdown(f"✅ `{col_name}`")
+    else:
+        st.warning("⚠️ Nenhuma coluna numérica encontrada.")
+    
+    st.markdown("---")
+    
+    st.markdown("##### 📝 Colunas Categóricas")
+    
+    colunas_categoricas = colunas_categoricas_base
+    
+    if colunas_categoricas:
+        num_cols = 4
+        cols = st.columns(num_cols)
+        for i, col_name in enumerate(colunas_categoricas):
+            with cols[i % num_cols]:
+                st.markdown(f"📌 `{col_name}`")
+    else:
+        st.info("ℹ️ Nenhuma coluna categórica encontrada.")
+
+
+# O corpo de um expander roda a cada rerun mesmo fechado; o toggle só renderiza quando ligado
+if st.toggle("📋 Ver Dados Utilizados nas Análises", value=False, key="mostrar_dados_analise"):
+    with st.container(border=True):
+        renderizar_dados_utilizados(df_filtrado)
+
+st.markdown("---")
+
+# ============================================================
+# BLOCOS INTERATIVOS (FRAGMENTOS)
+# ============================================================
+# Widgets de um fragmento reexecutam só o próprio bloco, sem refazer filtros, tabelas e o restante da página
+@st.fragment
+def renderizar_strip_plot(df_analise: pd.DataFrame, coluna_producao: str, medias_hibrido: pd.Series,
+                          media_geral: float, n_hibridos: int):
+    """Strip plot por híbrido com quadro de médias e opção de rótulos"""
+    # Verificar se cidade_cod3 existe
+    tem_cidade = 'cidade_cod3' in df_analise.columns
+    
+    # Opção para mostrar rótulos
+    if tem_cidade:
+        mostrar_rotulos = st.checkbox(
+            "🏷️ Mostrar rótulos (cidade_cod3)",
+            value=False,
+            key="mostrar_rotulos_strip"
+        )
+    else:
+        mostrar_rotulos = False
+    
+    # Figura em cache: reruns que não mudam dados, métrica ou rótulos não reconstroem os traces
+    fig = figura_strip(df_analise, coluna_producao, opcoes_producao[coluna_producao], medias_hibrido,
+                       media_geral, n_hibridos, mostrar_rotulos)
+    
+    st.plotly_chart(fig, use_container_width=True)
+
+
+@st.fragment
+def renderizar_probabilidade(agregados_hibrido: pd.DataFrame, coluna_producao: str, hibridos_selecionados: list,
+                             macros_selecionadas: list):
+    """Probabilidade de cada híbrido ficar na faixa de ±10% da média (estatística Z)"""
+    st.markdown("---")
+    
+    # Título com botão de informação
+    col_titulo_prob, col_info_prob = st.columns([11, 1])
+    
+    with col_titulo_prob:
+        st.markdown("### 📈 Probabilidade de Atingir a Média (Estatística Z)")
+    
+    with col_info_prob:
+        if st.button("ℹ️", key="btn_info_prob", help="Clique para ver como a probabilidade é calculada"):
+            mostrar_explicacao_probabilidade()
+    
+    # Mostrar macros selecionadas
+    if len(macros_selecionadas) <= 5:
+        macros_texto = ", ".join([str(m) for m in macros_selecionadas])
+    else:
+        macros_texto = f"{len(macros_selecionadas)} macros selecionadas"
+    
+    st.info(f"📊 **Análise de consistência dos híbridos** | Macros: {macros_texto} | Faixa de tolerância: **±10% da média**")
+    
+    # Calcular probabilidade por híbrido usando Z-score (reaproveita o groupby da tabela, cálculo vetorizado)
+    grupos_prob = agregados_hibrido[['count', 'mean', 'std']].reindex(hibridos_selecionados)
+    grupos_prob = grupos_prob[grupos_prob['count'] >= 1]
+    
+    n_obs = grupos_prob['count'].to_numpy()
+    media_hibrido = grupos_prob['mean'].to_numpy(dtype=np.float64)
+    std_hibrido = np.where(n_obs > 1, grupos_prob['std'].to_numpy(dtype=np.float64), 0.0)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cv_hibrido = np.where(media_hibrido != 0, std_hibrido / media_hibrido * 100, 0.0)
+        # Faixa de ±10% da média: Z = (μ·1.10 - μ) / σ e Z = (μ·0.90 - μ) / σ
+        z_superior = (media_hibrido * 1.10 - media_hibrido) / std_hibrido
+        z_inferior = (media_hibrido * 0.90 - media_hibrido) / std_hibrido
+        probabilidade = (ndtr(z_superior) - ndtr(z_inferior)) * 100  # ndtr: CDF normal padrão direto em C (sem o despacho do stats.norm)
+    
+    probabilidade = np.where(std_hibrido > 0, probabilidade, 100.0)
+    probabilidade = np.where(n_obs > 1, probabilidade, np.nan)  # 1 observação: sem probabilidade
+    
+    df_prob = pd.DataFrame({
+        'Híbrido': grupos_prob.index.to_numpy(),
+        'Observações': n_obs.astype(np.int32),
+        'Média': np.round(media_hibrido, 1),
+        'Desvio Padrão': np.round(std_hibrido, 1),
+        'CV (%)': np.round(cv_hibrido, 1),
+        'Probabilidade (%)': np.round(probabilidade, 1)
+    })
+    
+    # Filtrar apenas híbridos com probabilidade calculável
+    df_prob_valid = df_prob[df_prob['Probabilidade (%)'].notna()]
+    df_prob_valid = df_prob_valid.sort_values('Probabilidade (%)', ascending=False)
+    
+    # Classificação (faixas fechadas à esquerda: ≥75 Alta, ≥50 Média, ≥25 Baixa; sem probabilidade = N/A)
+    # Colunas já nascem na ordem final; a classificação entra por último
+    df_prob['Classificação'] = pd.cut(
+        df_prob['Probabilidade (%)'],
+        bins=[-np.inf, 25, 50, 75, np.inf],
+        labels=["🔴 Muito Baixa", "🟠 Baixa", "🟡 Média", "🟢 Alta"],
+        right=False
+    ).astype(object).fillna("⚪ N/A")
+    df_prob = df_prob.sort_values('Probabilidade (%)', ascending=False, na_position='last')
+    
+    # Métricas resumo
+    col_p1, col_p2, col_p3, col_p4 = st.columns(4)
+    
+    with col_p1:
+        hibridos_alta = len(df_prob[df_prob['Probabilidade (%)'] >= 75])
+        st.metric("🟢 Alta (≥75%)", hibridos_alta)
+    with col_p2:
+        hibridos_media_prob = len(df_prob[(df_prob['Probabilidade (%)'] >= 50) & (df_prob['Probabilidade (%)'] < 75)])
+        st.metric("🟡 Média (50-74%)", hibridos_media_prob)
+    with col_p3:
+        hibridos_baixa = len(df_prob[(df_prob['Probabilidade (%)'] >= 25) & (df_prob['Probabilidade (%)'] < 50)])
+        st.metric("🟠 Baixa (25-49%)", hibridos_baixa)
+    with col_p4:
+        hibridos_muito_baixa = len(df_prob[df_prob['Probabilidade (%)'] < 25])
+        st.metric("🔴 Muito Baixa (<25%)", hibridos_muito_baixa)
+    
+    st.markdown("---")
+    
+    # Gráfico de barras
+    if len(df_prob_valid) > 0:
+        fig_prob = px.bar(
+            df_prob_valid.sort_values('Probabilidade (%)', ascending=True),
+            x='Probabilidade (%)',
+            y='Híbrido',
+            orientation='h',
+            color='Probabilidade (%)',
+            color_continuous_scale='RdYlGn',
+            title="Probabilidade de Atingir a Média (±10%) - Baseado na Estatística Z",
+            text='Probabilidade (%)',
+            hover_data=['CV (%)', 'Desvio Padrão', 'Observações']
+        )
         
-        st.markdown("---")
+        fig_prob.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
         
-        st.markdown("##### 📝 Colunas Categóricas")
+        fig_prob.add_vline(
+            x=50,
+            line_dash="dash",
+            line_color="gray",
+            line_width=2,
+            annotation_text="50%",
+            annotation_position="top"
+        )
         
-        colunas_categoricas = df_filtrado.select_dtypes(include=['object', 'category']).columns.tolist()
+        fig_prob.add_vline(
+            x=68.27,
+            line_dash="dot",
+            line_color="blue",
+            line_width=1,
+            annotation_text="68.3% (1σ)",
+            annotation_position="bottom"
+        )
         
-        if colunas_categoricas:
-            num_cols = 4
-            cols = st.columns(num_cols)
-            for i, col_name in enumerate(colunas_categoricas):
-                with cols[i % num_cols]:
-                    st.markdown(f"📌 `{col_name}`")
-        else:
-            st.info("ℹ️ Nenhuma coluna categórica encontrada.")
+        fig_prob.update_layout(
+            plot_bgcolor='white',
+            paper_bgcolor='white',
+            font=dict(color=PALETA_CORES['text_dark']),
+            height=max(400, len(df_prob_valid) * 35),
+            xaxis=dict(range=[0, 105]),
+            showlegend=False
+        )
+        
+        st.plotly_chart(fig_prob, use_container_width=True)
+    
+    # Tabela
+    st.markdown("##### 📋 Tabela de Probabilidades")
+    
+    criar_aggrid(df_prob, altura=400, colunas_texto=['Híbrido', 'Classificação'])
+    
+    # Download
+    st.download_button(
+        label="📥 Download Probabilidades (CSV)",
+        data=partial(gerar_csv, df_prob),
+        file_name=f"probabilidades_zscore_{coluna_producao}.csv",
+        mime="text/csv"
+    )
 
-st.markdown("---")
 
 # ============================================================
 # CONTEÚDO PRINCIPAL - ANÁLISE DE PRODUÇÃO
@@ -374,7 +741,7 @@ with col_filtro2:
     st.markdown("##### 🧭 Filtrar por Macro MKT")
     
     if "macro_mkt" in df_filtrado.columns:
-        macros_disponiveis = sorted(df_filtrado["macro_mkt"].dropna().unique().tolist())
+        macros_disponiveis = categorias_presentes(df_filtrado["macro_mkt"])
         
         todas_macros = st.checkbox(
             "Selecionar Todas as Macros",
@@ -393,12 +760,12 @@ with col_filtro2:
             )
         
         if macros_selecionadas:
-            df_analise = df_filtrado[df_filtrado["macro_mkt"].isin(macros_selecionadas)].copy()
+            df_analise = df_filtrado.loc[mascara_categorias(df_filtrado["macro_mkt"], macros_selecionadas)]
         else:
-            df_analise = df_filtrado.copy()
+            df_analise = df_filtrado
             macros_selecionadas = macros_disponiveis
     else:
-        df_analise = df_filtrado.copy()
+        df_analise = df_filtrado
         macros_selecionadas = []
         st.info("ℹ️ Coluna 'macro_mkt' não encontrada.")
 
@@ -406,7 +773,7 @@ with col_filtro3:
     st.markdown("##### 🧬 Filtrar por Híbridos")
     
     if "hibrido" in df_analise.columns:
-        hibridos_disponiveis = sorted(df_analise["hibrido"].dropna().unique().tolist())
+        hibridos_disponiveis = categorias_presentes(df_analise["hibrido"])
         
         todos_hibridos = st.checkbox(
             "Selecionar Todos os Híbridos",
@@ -425,7 +792,7 @@ with col_filtro3:
             )
         
         if hibridos_selecionados:
-            df_analise = df_analise[df_analise["hibrido"].isin(hibridos_selecionados)].copy()
+            df_analise = df_analise.loc[mascara_categorias(df_analise["hibrido"], hibridos_selecionados)]
         else:
             st.warning("⚠️ Selecione pelo menos um híbrido.")
             hibridos_selecionados = hibridos_disponiveis
@@ -456,155 +823,21 @@ st.markdown("---")
 # ----- STRIP PLOT COM RÓTULOS E QUADRO DE MÉDIA -----
 if len(df_analise) > 0 and len(hibridos_selecionados) > 0:
     
-    # Calcular média por híbrido para ordenar
-    medias_hibrido = df_analise.groupby('hibrido')[coluna_producao].mean().sort_values(ascending=False)
-    ordem_hibridos = medias_hibrido.index.tolist()
-    
-    # Verificar se cidade_cod3 existe
-    tem_cidade = 'cidade_cod3' in df_analise.columns
-    
-    # Opção para mostrar rótulos
-    if tem_cidade:
-        mostrar_rotulos = st.checkbox(
-            "🏷️ Mostrar rótulos (cidade_cod3)",
-            value=False,
-            key="mostrar_rotulos_strip"
-        )
-    else:
-        mostrar_rotulos = False
-    
-    # Preparar dados com jitter manual no eixo Y
-    df_plot = df_analise.copy()
-    
-    # Criar mapeamento numérico para híbridos
-    hibrido_map = {h: i for i, h in enumerate(ordem_hibridos)}
-    df_plot['hibrido_num'] = df_plot['hibrido'].map(hibrido_map)
-    
-    # Adicionar jitter
-    np.random.seed(42)
-    df_plot['hibrido_jitter'] = df_plot['hibrido_num'] + np.random.uniform(-0.3, 0.3, len(df_plot))
-    
-    # Criar figura
-    fig = go.Figure()
-    
-    # Cores
-    cores = px.colors.qualitative.Set2
-    
-    # Adicionar pontos por híbrido
-    for i, hibrido in enumerate(ordem_hibridos):
-        df_h = df_plot[df_plot['hibrido'] == hibrido]
-        
-        cor = cores[i % len(cores)]
-        
-        # Calcular média do híbrido
-        media_hibrido_valor = df_h[coluna_producao].mean()
-        
-        # Configurar texto e modo
-        if mostrar_rotulos and tem_cidade:
-            texto = df_h['cidade_cod3'].astype(str).tolist()
-            modo = 'markers+text'
-        else:
-            texto = None
-            modo = 'markers'
-        
-        # Hover template
-        if tem_cidade:
-            hover_texto = [
-                f"<b>{cidade}</b><br>{opcoes_producao[coluna_producao]}: {prod:,.1f}<br>Híbrido: {hibrido}"
-                for cidade, prod in zip(df_h['cidade_cod3'].astype(str), df_h[coluna_producao])
-            ]
-        else:
-            hover_texto = [
-                f"{opcoes_producao[coluna_producao]}: {prod:,.1f}<br>Híbrido: {hibrido}"
-                for prod in df_h[coluna_producao]
-            ]
-        
-        # Adicionar pontos
-        fig.add_trace(go.Scatter(
-            x=df_h[coluna_producao],
-            y=df_h['hibrido_jitter'],
-            mode=modo,
-            name=hibrido,
-            text=texto,
-            textposition='top center',
-            textfont=dict(size=8, color='black'),
-            marker=dict(
-                size=10,
-                color=cor,
-                opacity=0.7,
-                line=dict(width=1, color='white')
-            ),
-            hovertext=hover_texto,
-            hoverinfo='text'
-        ))
-        
-        # Adicionar quadro com a média do híbrido
-        fig.add_trace(go.Scatter(
-            x=[media_hibrido_valor],
-            y=[i],
-            mode='markers+text',
-            name=f'Média {hibrido}',
-            text=[f'{media_hibrido_valor:,.0f}'],
-            textposition='middle center',
-            textfont=dict(size=9, color='white', family='Arial Black'),
-            marker=dict(
-                size=40,
-                color=cor,
-                symbol='square',
-                opacity=0.9,
-                line=dict(width=2, color='white')
-            ),
-            hovertemplate=f"<b>Média {hibrido}</b><br>{opcoes_producao[coluna_producao]}: {media_hibrido_valor:,.1f}<extra></extra>",
-            showlegend=False
-        ))
-    
-    # Adicionar linha de média geral (referência)
-    fig.add_vline(
-        x=media_geral,
-        line_dash="dash",
-        line_color="red",
-        line_width=2,
-        annotation_text=f"Média Geral: {media_geral:,.1f}",
-        annotation_position="top"
+    # Um único groupby alimenta a ordem do gráfico, a tabela de estatísticas e a probabilidade
+    agregados_hibrido = df_analise.groupby('hibrido', observed=True)[coluna_producao].agg(
+        ['count', 'mean', 'median', 'std', 'min', 'max']
     )
     
-    # Layout
-    fig.update_layout(
-        title=f"Distribuição de {opcoes_producao[coluna_producao]} por Híbrido",
-        plot_bgcolor='white',
-        paper_bgcolor='white',
-        font=dict(color=PALETA_CORES['text_dark']),
-        showlegend=False,
-        height=max(500, len(hibridos_selecionados) * 45),
-        xaxis=dict(
-            title=opcoes_producao[coluna_producao],
-            gridcolor='lightgray',
-            gridwidth=0.5
-        ),
-        yaxis=dict(
-            title="",
-            tickmode='array',
-            tickvals=list(range(len(ordem_hibridos))),
-            ticktext=ordem_hibridos,
-            gridcolor='lightgray',
-            gridwidth=0.5
-        )
-    )
-    
-    st.plotly_chart(fig, use_container_width=True)
+    # Calcular média por híbrido para ordenar
+    medias_hibrido = agregados_hibrido['mean'].sort_values(ascending=False)
+    renderizar_strip_plot(df_analise, coluna_producao, medias_hibrido, media_geral, len(hibridos_selecionados))
     
     # ----- TABELA DE ESTATÍSTICAS -----
     st.markdown("##### 📊 Estatísticas por Híbrido")
     
-    stats_hibrido = df_analise.groupby('hibrido')[coluna_producao].agg([
-        ('Contagem', 'count'),
-        ('Média', 'mean'),
-        ('Mediana', 'median'),
-        ('Desvio Padrão', 'std'),
-        ('Mínimo', 'min'),
-        ('Máximo', 'max'),
-        ('CV %', lambda x: (x.std() / x.mean() * 100) if x.mean() != 0 else 0)
-    ]).round(2).reset_index()
+    stats_hibrido = agregados_hibrido.assign(
+        cv=(agregados_hibrido['std'] / agregados_hibrido['mean'] * 100).where(agregados_hibrido['mean'] != 0, 0)
+    ).round(2).reset_index()
     
     stats_hibrido.columns = ['Híbrido', 'Contagem', 'Média', 'Mediana', 'Desvio Padrão', 'Mínimo', 'Máximo', 'CV %']
     stats_hibrido = stats_hibrido.sort_values('Média', ascending=False)
@@ -614,175 +847,13 @@ if len(df_analise) > 0 and len(hibridos_selecionados) > 0:
     # Download
     st.download_button(
         label="📥 Download Estatísticas (CSV)",
-        data=stats_hibrido.to_csv(index=False).encode('utf-8'),
+        data=partial(gerar_csv, stats_hibrido),
         file_name=f"estatisticas_{coluna_producao}.csv",
         mime="text/csv"
     )
     
-    # ============================================================
-    # ANÁLISE DE PROBABILIDADE (COM ESTATÍSTICA Z)
-    # ============================================================
-    
-    st.markdown("---")
-    
-    # Título com botão de informação
-    col_titulo_prob, col_info_prob = st.columns([11, 1])
-    
-    with col_titulo_prob:
-        st.markdown("### 📈 Probabilidade de Atingir a Média (Estatística Z)")
-    
-    with col_info_prob:
-        if st.button("ℹ️", key="btn_info_prob", help="Clique para ver como a probabilidade é calculada"):
-            mostrar_explicacao_probabilidade()
-    
-    # Mostrar macros selecionadas
-    if len(macros_selecionadas) <= 5:
-        macros_texto = ", ".join([str(m) for m in macros_selecionadas])
-    else:
-        macros_texto = f"{len(macros_selecionadas)} macros selecionadas"
-    
-    st.info(f"📊 **Análise de consistência dos híbridos** | Macros: {macros_texto} | Faixa de tolerância: **±10% da média**")
-    
-    # Calcular probabilidade por híbrido usando Z-score
-    probabilidades = []
-    
-    for hibrido in hibridos_selecionados:
-        df_h = df_analise[df_analise['hibrido'] == hibrido][coluna_producao].dropna()
-        
-        if len(df_h) > 1:
-            n_obs = len(df_h)
-            media_hibrido = df_h.mean()
-            std_hibrido = df_h.std()
-            cv_hibrido = (std_hibrido / media_hibrido * 100) if media_hibrido != 0 else 0
-            
-            if std_hibrido > 0:
-                limite_inferior = media_hibrido * 0.90
-                limite_superior = media_hibrido * 1.10
-                
-                z_inferior = (limite_inferior - media_hibrido) / std_hibrido
-                z_superior = (limite_superior - media_hibrido) / std_hibrido
-                
-                probabilidade = (stats.norm.cdf(z_superior) - stats.norm.cdf(z_inferior)) * 100
-            else:
-                probabilidade = 100.0
-            
-            probabilidades.append({
-                'Híbrido': hibrido,
-                'Observações': n_obs,
-                'Média': round(media_hibrido, 1),
-                'Desvio Padrão': round(std_hibrido, 1),
-                'CV (%)': round(cv_hibrido, 1),
-                'Probabilidade (%)': round(probabilidade, 1)
-            })
-        elif len(df_h) == 1:
-            probabilidades.append({
-                'Híbrido': hibrido,
-                'Observações': 1,
-                'Média': round(df_h.mean(), 1),
-                'Desvio Padrão': 0.0,
-                'CV (%)': 0.0,
-                'Probabilidade (%)': None
-            })
-    
-    # Criar DataFrame
-    df_prob = pd.DataFrame(probabilidades)
-    
-    # Filtrar apenas híbridos com probabilidade calculável
-    df_prob_valid = df_prob[df_prob['Probabilidade (%)'].notna()].copy()
-    df_prob_valid = df_prob_valid.sort_values('Probabilidade (%)', ascending=False)
-    
-    # Classificação
-    def classificar_probabilidade(prob):
-        if pd.isna(prob):
-            return "⚪ N/A"
-        elif prob >= 75:
-            return "🟢 Alta"
-        elif prob >= 50:
-            return "🟡 Média"
-        elif prob >= 25:
-            return "🟠 Baixa"
-        else:
-            return "🔴 Muito Baixa"
-    
-    df_prob['Classificação'] = df_prob['Probabilidade (%)'].apply(classificar_probabilidade)
-    df_prob = df_prob[['Híbrido', 'Observações', 'Média', 'Desvio Padrão', 'CV (%)', 'Probabilidade (%)', 'Classificação']]
-    df_prob = df_prob.sort_values('Probabilidade (%)', ascending=False, na_position='last')
-    
-    # Métricas resumo
-    col_p1, col_p2, col_p3, col_p4 = st.columns(4)
-    
-    with col_p1:
-        hibridos_alta = len(df_prob[df_prob['Probabilidade (%)'] >= 75])
-        st.metric("🟢 Alta (≥75%)", hibridos_alta)
-    with col_p2:
-        hibridos_media_prob = len(df_prob[(df_prob['Probabilidade (%)'] >= 50) & (df_prob['Probabilidade (%)'] < 75)])
-        st.metric("🟡 Média (50-74%)", hibridos_media_prob)
-    with col_p3:
-        hibridos_baixa = len(df_prob[(df_prob['Probabilidade (%)'] >= 25) & (df_prob['Probabilidade (%)'] < 50)])
-        st.metric("🟠 Baixa (25-49%)", hibridos_baixa)
-    with col_p4:
-        hibridos_muito_baixa = len(df_prob[df_prob['Probabilidade (%)'] < 25])
-        st.metric("🔴 Muito Baixa (<25%)", hibridos_muito_baixa)
-    
-    st.markdown("---")
-    
-    # Gráfico de barras
-    if len(df_prob_valid) > 0:
-        fig_prob = px.bar(
-            df_prob_valid.sort_values('Probabilidade (%)', ascending=True),
-            x='Probabilidade (%)',
-            y='Híbrido',
-            orientation='h',
-            color='Probabilidade (%)',
-            color_continuous_scale='RdYlGn',
-            title="Probabilidade de Atingir a Média (±10%) - Baseado na Estatística Z",
-            text='Probabilidade (%)',
-            hover_data=['CV (%)', 'Desvio Padrão', 'Observações']
-        )
-        
-        fig_prob.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
-        
-        fig_prob.add_vline(
-            x=50,
-            line_dash="dash",
-            line_color="gray",
-            line_width=2,
-            annotation_text="50%",
-            annotation_position="top"
-        )
-        
-        fig_prob.add_vline(
-            x=68.27,
-            line_dash="dot",
-            line_color="blue",
-            line_width=1,
-            annotation_text="68.3% (1σ)",
-            annotation_position="bottom"
-        )
-        
-        fig_prob.update_layout(
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            font=dict(color=PALETA_CORES['text_dark']),
-            height=max(400, len(df_prob_valid) * 35),
-            xaxis=dict(range=[0, 105]),
-            showlegend=False
-        )
-        
-        st.plotly_chart(fig_prob, use_container_width=True)
-    
-    # Tabela
-    st.markdown("##### 📋 Tabela de Probabilidades")
-    
-    criar_aggrid(df_prob, altura=400, colunas_texto=['Híbrido', 'Classificação'])
-    
-    # Download
-    st.download_button(
-        label="📥 Download Probabilidades (CSV)",
-        data=df_prob.to_csv(index=False).encode('utf-8'),
-        file_name=f"probabilidades_zscore_{coluna_producao}.csv",
-        mime="text/csv"
-    )
+    # ----- ANÁLISE DE PROBABILIDADE (COM ESTATÍSTICA Z) -----
+    renderizar_probabilidade(agregados_hibrido, coluna_producao, hibridos_selecionados, macros_selecionadas)
 
 else:
     st.warning("⚠️ Nenhum dado disponível para os filtros selecionados.")
@@ -11,84 +11,327 @@ import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
 import sys
+from datetime import datetime
+from functools import partial
+from io import BytesIO
 from pathlib import Path
-from scipy import stats
+from scipy.special import erf
 
 # Adicionar diretório raiz ao path para importar módulos
 sys.path.append(str(Path(__file__).parent.parent))
 
 from config import PALETA_CORES
-from utils import criar_breadcrumb, criar_aggrid, logger
+from utils import (criar_breadcrumb, criar_aggrid, categorias_presentes, mascara_categorias, preencher_template,
+                   reduzir_tipos_numericos, logger)
 
 # ============================================================
-# CONFIGURAÇÃO DA PÁGINA
-# ============================================================
-st.set_page_config(
-    page_title="Confiabilidade dos Híbridos",
-    page_icon="🎯",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-# ============================================================
-# CSS CUSTOMIZADO
+# CONTEÚDO ESTÁTICO (CSS, CABEÇALHO E RODAPÉ)
 # ============================================================
-st.markdown(f"""
+CSS_TEMPLATE = """
     <style>
-    .main {{
-        background-color: {PALETA_CORES['bg_light']};
-    }}
+    .main {
+        background-color: ${bg_light};
+    }
     
-    .metric-card {{
+    .metric-card {
         background: white;
         padding: 1.5rem;
         border-radius: 10px;
         box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        border-left: 4px solid {PALETA_CORES['secondary']};
+        border-left: 4px solid ${secondary};
         margin-bottom: 1rem;
-    }}
+    }
     
-    .score-card {{
-        background: linear-gradient(135deg, {PALETA_CORES['primary']} 0%, {PALETA_CORES['secondary']} 100%);
+    .score-card {
+        background: linear-gradient(135deg, ${primary} 0%, ${secondary} 100%);
         padding: 2rem;
         border-radius: 15px;
         text-align: center;
         color: white;
         box-shadow: 0 4px 6px rgba(0,104,56,0.3);
-    }}
+    }
     
-    .score-value {{
+    .score-value {
         font-size: 3rem;
         font-weight: bold;
         margin: 0;
-    }}
+    }
     
-    .score-label {{
+    .score-label {
         font-size: 1rem;
         opacity: 0.9;
-    }}
+    }
     
-    .stTabs [data-baseweb="tab-list"] {{
+    .stTabs [data-baseweb="tab-list"] {
         gap: 12px;
         background-color: white;
         padding: 0.75rem;
         border-radius: 8px;
-    }}
+    }
     
-    .stTabs [data-baseweb="tab"] {{
-        background-color: {PALETA_CORES['bg_light']};
+    .stTabs [data-baseweb="tab"] {
+        background-color: ${bg_light};
         border-radius: 6px;
-        color: {PALETA_CORES['primary']};
+        color: ${primary};
         font-weight: 500;
         padding: 0.75rem 1.5rem !important;
-    }}
+    }
     
-    .stTabs [aria-selected="true"] {{
-        background: linear-gradient(135deg, {PALETA_CORES['primary']} 0%, {PALETA_CORES['secondary']} 100%);
+    .stTabs [aria-selected="true"] {
+        background: linear-gradient(135deg, ${primary} 0%, ${secondary} 100%);
         color: white;
-    }}
+    }
     </style>
-""", unsafe_allow_html=True)
+"""
+
+CSS_PAGINA = preencher_template(CSS_TEMPLATE, **PALETA_CORES)
+
+CABECALHO_TEMPLATE = """
+    <div style='background: linear-gradient(135deg, ${primary} 0%, ${secondary} 100%); 
+                padding: 2rem; border-radius: 10px; margin-bottom: 2rem; box-shadow: 0 4px 6px rgba(0,104,56,0.2);'>
+        <h1 style='color: white; margin: 0; text-shadow: 2px 2px 4px rgba(0,0,0,0.2);'>🎯 Confiabilidade dos Híbridos</h1>
+        <p style='color: white; margin-top: 0.5rem; opacity: 0.95;'>"Esse híbrido entrega o que promete?"</p>
+    </div>
+"""
+
+CABECALHO_HTML = preencher_template(CABECALHO_TEMPLATE, **PALETA_CORES)
+
+# Só o horário muda a cada rerun: a paleta entra uma vez e {atualizacao} fica para o str.format
+RODAPE_TEMPLATE = """
+    <div style='text-align: center; color: ${primary}; padding: 2rem 0;'>
+        <p style='font-weight: 600;'>Confiabilidade dos Híbridos | Sistema de Produção Agrícola</p>
+        <p style='font-size: 0.875rem; color: ${secondary};'>
+            Última atualização: {atualizacao}
+        </p>
+    </div>
+"""
+
+RODAPE_HTML = preencher_template(RODAPE_TEMPLATE, **PALETA_CORES)
+
+# ============================================================
+# CONFIGURAÇÃO DA PÁGINA
+# ============================================================
+st.set_page_config(
+    page_title="Confiabilidade dos Híbridos",
+    page_icon="🎯",
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
+
+# ============================================================
+# CSS CUSTOMIZADO
+# ============================================================
+st.markdown(CSS_PAGINA, unsafe_allow_html=True)
+
+# ============================================================
+# FUNÇÕES AUXILIARES
+# ============================================================
+@st.cache_data(show_spinner=False, max_entries=8)
+def otimizar_tipos(df: pd.DataFrame) -> pd.DataFrame:
+    """Garante medições em float32 e hibrido/macro_mkt como category (no-op para a base do app)"""
+    df = reduzir_tipos_numericos(df.copy(deep=False))
+    for col in ['hibrido', 'macro_mkt']:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def gerar_csv(df: pd.DataFrame) -> bytes:
+    """CSV para download (gerado apenas no clique e reaproveitado via cache)"""
+    buffer = BytesIO()  # escreve os bytes direto, sem a str intermediária do to_csv()
+    df.to_csv(buffer, index=False, encoding='utf-8')
+    return buffer.getvalue()
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def calcular_confiabilidade(df_analise: pd.DataFrame, coluna_producao: str, hibridos_selecionados: tuple) -> tuple:
+    """
+    Probabilidade Z, taxa de sucesso, risco e score de cada híbrido selecionado
+    Retorna: (df_conf ordenado por Score com Rank, media_geral, limiar_sucesso)
+    """
+    # Métricas de todos os híbridos via np.bincount sobre os códigos do híbrido (uma passada em C por soma)
+    if isinstance(df_analise['hibrido'].dtype, pd.CategoricalDtype):
+        codigos = df_analise['hibrido'].cat.codes.to_numpy()
+        hibridos = df_analise['hibrido'].cat.categories
+    else:
+        codigos, hibridos = pd.factorize(df_analise['hibrido'])
+    # Coluna chega em float32 (otimizar_tipos); os pesos do bincount são acumulados em float64 de qualquer forma
+    valores = df_analise[coluna_producao].to_numpy(dtype=np.float64)
+    
+    # Linhas sem híbrido ou sem produção não entram em nenhuma contagem
+    validos = (codigos >= 0) & ~np.isnan(valores)
+    if not validos.all():
+        codigos = codigos[validos]
+        valores = valores[validos]
+    
+    contagem = np.bincount(codigos, minlength=len(hibridos))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        somas = np.bincount(codigos, weights=valores, minlength=len(hibridos))
+        medias = somas / contagem
+        # Média do grupo de cada linha: um único gather, reaproveitado pelo desvio padrão e pela frustração
+        media_linha = medias[codigos]
+        # Desvio padrão amostral em duas passadas (desvios em relação à média do grupo), quadrado no próprio buffer
+        desvios = valores - media_linha
+        np.multiply(desvios, desvios, out=desvios)
+        desvios_padrao = np.sqrt(np.bincount(codigos, weights=desvios, minlength=len(hibridos)) / (contagem - 1))
+    
+    # Média geral das macros selecionadas, a partir das mesmas somas por híbrido (sem outra passada na coluna)
+    with np.errstate(invalid='ignore'):
+        media_geral = somas.sum() / contagem.sum()
+    limiar_sucesso = media_geral * 0.80
+    
+    # Sucesso: limiar global; frustração: 80% da média do próprio híbrido
+    sucesso = np.bincount(codigos, weights=valores >= limiar_sucesso, minlength=len(hibridos))
+    media_linha *= 0.80
+    frustracao = np.bincount(codigos, weights=valores < media_linha, minlength=len(hibridos))
+    
+    # Mesma ordem da seleção; híbridos com uma observação ou menos ficam de fora
+    posicoes = hibridos.get_indexer(list(hibridos_selecionados))
+    posicoes = posicoes[posicoes >= 0]
+    posicoes = posicoes[contagem[posicoes] > 1]
+    
+    n_obs = contagem[posicoes]
+    media_hibrido = medias[posicoes]
+    std_hibrido = desvios_padrao[posicoes]
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cv_hibrido = np.where(media_hibrido != 0, std_hibrido / media_hibrido * 100, 0.0)
+        
+        # 1. Probabilidade Z (±10% da média)
+        # Faixa simétrica: Φ(z) - Φ(-z) = erf(z / √2), com z = 0.10·μ / σ (uma única chamada, sem as duas CDFs)
+        z_sup = (media_hibrido * 0.10) / std_hibrido
+        prob_z = erf(z_sup / np.sqrt(2)) * 100
+    prob_z = np.where(std_hibrido > 0, prob_z, 100.0)
+    
+    # 2. Taxa de Sucesso (>= 80% da média geral)
+    taxa_sucesso = sucesso[posicoes] / n_obs * 100
+    
+    # 3. Risco de Frustração (< 80% da média do híbrido)
+    risco_frustracao = frustracao[posicoes] / n_obs * 100
+    
+    # 4. Fator de Observações
+    fator_obs = np.select([n_obs >= 20, n_obs >= 10, n_obs >= 5], [100, 80, 60], default=40)
+    
+    # 5. Score de Confiabilidade (0-100)
+    score = (
+        (prob_z * 0.35) +
+        (taxa_sucesso * 0.35) +
+        ((100 - risco_frustracao) * 0.20) +
+        (fator_obs * 0.10)
+    )
+    
+    # Classificação do Score
+    classificacao = np.select(
+        [score >= 80, score >= 65, score >= 50],
+        ["🏆 Excelente", "🥈 Bom", "🥉 Regular"],
+        default="⚠️ Baixo"
+    )
+    
+    # Criar DataFrame
+    df_conf = pd.DataFrame({
+        'Híbrido': hibridos[posicoes].to_numpy(dtype=object),
+        'Observações': n_obs,
+        'Média': np.round(media_hibrido, 1),
+        'CV (%)': np.round(cv_hibrido, 1),
+        'Prob. Z (%)': np.round(prob_z, 1),
+        'Taxa Sucesso (%)': np.round(taxa_sucesso, 1),
+        'Risco (%)': np.round(risco_frustracao, 1),
+        'Score': np.round(score, 1),
+        'Classificação': classificacao.astype(object)
+    })
+    df_conf = df_conf.sort_values('Score', ascending=False).reset_index(drop=True)
+    df_conf.index = df_conf.index + 1
+    df_conf.index.name = 'Rank'
+    df_conf = df_conf.reset_index()
+    
+    logger.info(f"🎯 Confiabilidade calculada: {len(df_conf)} híbridos ({coluna_producao})")
+    return df_conf, media_geral, limiar_sucesso
+
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def figura_radar(registros_top5: tuple) -> go.Figure:
+    """Radar das métricas dos top 5 (registros: Híbrido, Prob. Z, Taxa Sucesso, Risco, Score)"""
+    categorias = ['Prob. Z', 'Taxa Sucesso', '100 - Risco', 'Score']
+    theta = categorias + [categorias[0]]
+    
+    fig_radar = go.Figure()
+    
+    cores_radar = px.colors.qualitative.Set2
+    
+    # Registros já são tuplas: leitura posicional, sem montar DataFrame nem Series por linha (iterrows)
+    for idx, (hibrido, prob_z, taxa_sucesso, risco, score) in enumerate(registros_top5):
+        fig_radar.add_trace(go.Scatterpolar(
+            r=[prob_z, taxa_sucesso, 100 - risco, score, prob_z],
+            theta=theta,
+            fill='toself',
+            name=hibrido,
+            line_color=cores_radar[idx % len(cores_radar)],
+            opacity=0.7
+        ))
+    
+    fig_radar.update_layout(
+        polar=dict(
+            radialaxis=dict(
+                visible=True,
+                range=[0, 100]
+            )
+        ),
+        showlegend=True,
+        title="Comparativo de Métricas - Top 5 Híbridos",
+        height=500
+    )
+    
+    return fig_radar
+
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def figura_ranking(registros: tuple) -> go.Figure:
+    """Barras do Score por híbrido (registros Híbrido/Score, Score decrescente); figura compartilhada, não alterar"""
+    df_conf = pd.DataFrame(registros, columns=['Híbrido', 'Score'])
+    
+    # Registros já vêm do df_conf ordenado por Score decrescente: inverter basta, sem novo sort
+    fig_score = px.bar(
+        df_conf.iloc[::-1],
+        x='Score',
+        y='Híbrido',
+        orientation='h',
+        color='Score',
+        color_continuous_scale='RdYlGn',
+        title="Score de Confiabilidade por Híbrido",
+        text='Score'
+    )
+    
+    fig_score.update_traces(texttemplate='%{text:.1f}', textposition='outside')
+    
+    fig_score.add_vline(x=80, line_dash="dash", line_color="green", line_width=2,
+                        annotation_text="Excelente (80)", annotation_position="top")
+    fig_score.add_vline(x=65, line_dash="dash", line_color="orange", line_width=1,
+                        annotation_text="Bom (65)", annotation_position="bottom")
+    fig_score.add_vline(x=50, line_dash="dash", line_color="red", line_width=1,
+                        annotation_text="Regular (50)", annotation_position="top")
+    
+    fig_score.update_layout(
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        height=max(400, len(df_conf) * 35),
+        xaxis=dict(range=[0, 105]),
+        showlegend=False
+    )
+    
+    return fig_score
+
+
+@st.fragment
+def titulo_com_info(titulo: str, chave: str, ajuda: str, abrir_modal, proporcao: tuple = (5, 1)):
+    """Título com botão ℹ️; o clique reexecuta só este fragmento (e abre o modal), não a página inteira"""
+    col_titulo, col_btn = st.columns(proporcao)
+    with col_titulo:
+        st.markdown(titulo)
+    with col_btn:
+        if st.button("ℹ️", key=chave, help=ajuda):
+            abrir_modal()
+
 
 # ============================================================
 # MODAIS DE EXPLICAÇÃO
@@ -367,13 +610,7 @@ def mostrar_explicacao_ranking():
 # ============================================================
 # CABEÇALHO
 # ============================================================
-st.markdown(f"""
-    <div style='background: linear-gradient(135deg, {PALETA_CORES['primary']} 0%, {PALETA_CORES['secondary']} 100%); 
-                padding: 2rem; border-radius: 10px; margin-bottom: 2rem; box-shadow: 0 4px 6px rgba(0,104,56,0.2);'>
-        <h1 style='color: white; margin: 0; text-shadow: 2px 2px 4px rgba(0,0,0,0.2);'>🎯 Confiabilidade dos Híbridos</h1>
-        <p style='color: white; margin-top: 0.5rem; opacity: 0.95;'>"Esse híbrido entrega o que promete?"</p>
-    </div>
-""", unsafe_allow_html=True)
+st.markdown(CABECALHO_HTML, unsafe_allow_html=True)
 
 criar_breadcrumb("Confiabilidade dos Híbridos")
 
@@ -386,7 +623,8 @@ if "df_final" not in st.session_state:
     st.stop()
 
 df = st.session_state["df_final"]
-df_filtrado = st.session_state.get("df_filtrado", df)
+df_filtrado_sessao = st.session_state.get("df_filtrado", df)
+df_filtrado = otimizar_tipos(df_filtrado_sessao)
 
 logger.info(f"🎯 Página de Confiabilidade carregada: {len(df)} registros")
 
@@ -423,7 +661,7 @@ with col_filtro2:
     st.markdown("##### 🧭 Filtrar por Macro MKT")
     
     if "macro_mkt" in df_filtrado.columns:
-        macros_disponiveis = sorted(df_filtrado["macro_mkt"].dropna().unique().tolist())
+        macros_disponiveis = categorias_presentes(df_filtrado["macro_mkt"])
         
         todas_macros = st.checkbox(
             "Selecionar Todas as Macros",
@@ -442,19 +680,19 @@ with col_filtro2:
             )
         
         if macros_selecionadas:
-            df_analise = df_filtrado[df_filtrado["macro_mkt"].isin(macros_selecionadas)].copy()
+            df_analise = df_filtrado.loc[mascara_categorias(df_filtrado["macro_mkt"], macros_selecionadas)]
         else:
-            df_analise = df_filtrado.copy()
+            df_analise = df_filtrado
             macros_selecionadas = macros_disponiveis
     else:
-        df_analise = df_filtrado.copy()
+        df_analise = df_filtrado
         macros_selecionadas = []
 
 with col_filtro3:
     st.markdown("##### 🧬 Filtrar por Híbridos")
     
     if "hibrido" in df_analise.columns:
-        hibridos_disponiveis = sorted(df_analise["hibrido"].dropna().unique().tolist())
+        hibridos_disponiveis = categorias_presentes(df_analise["hibrido"])
         
         todos_hibridos = st.checkbox(
             "Selecionar Todos os Híbridos",
@@ -474,7 +712,7 @@ with col_filtro3:
             )
         
         if hibridos_selecionados:
-            df_analise = df_analise[df_analise["hibrido"].isin(hibridos_selecionados)].copy()
+            df_analise = df_analise.loc[mascara_categorias(df_analise["hibrido"], hibridos_selecionados)]
         else:
             st.warning("⚠️ Selecione pelo menos um híbrido.")
             st.stop()
@@ -490,87 +728,15 @@ st.markdown("---")
 
 if len(df_analise) > 0 and len(hibridos_selecionados) > 0:
     
-    # Média geral das macros selecionadas
-    media_geral = df_analise[coluna_producao].mean()
-    limiar_sucesso = media_geral * 0.80
-    
-    # Calcular métricas para cada híbrido
-    resultados = []
-    
-    for hibrido in hibridos_selecionados:
-        df_h = df_analise[df_analise['hibrido'] == hibrido][coluna_producao].dropna()
-        
-        if len(df_h) > 1:
-            n_obs = len(df_h)
-            media_hibrido = df_h.mean()
-            std_hibrido = df_h.std()
-            cv_hibrido = (std_hibrido / media_hibrido * 100) if media_hibrido != 0 else 0
-            
-            # 1. Probabilidade Z (±10% da média)
-            if std_hibrido > 0:
-                limite_inf = media_hibrido * 0.90
-                limite_sup = media_hibrido * 1.10
-                z_inf = (limite_inf - media_hibrido) / std_hibrido
-                z_sup = (limite_sup - media_hibrido) / std_hibrido
-                prob_z = (stats.norm.cdf(z_sup) - stats.norm.cdf(z_inf)) * 100
-            else:
-                prob_z = 100.0
-            
-            # 2. Taxa de Sucesso (>= 80% da média geral)
-            obs_sucesso = (df_h >= limiar_sucesso).sum()
-            taxa_sucesso = (obs_sucesso / n_obs) * 100
-            
-            # 3. Risco de Frustração (< 80% da média do híbrido)
-            limiar_frustracao = media_hibrido * 0.80
-            obs_frustracao = (df_h < limiar_frustracao).sum()
-            risco_frustracao = (obs_frustracao / n_obs) * 100
-            
-            # 4. Fator de Observações
-            if n_obs >= 20:
-                fator_obs = 100
-            elif n_obs >= 10:
-                fator_obs = 80
-            elif n_obs >= 5:
-                fator_obs = 60
-            else:
-                fator_obs = 40
-            
-            # 5. Score de Confiabilidade (0-100)
-            score = (
-                (prob_z * 0.35) +
-                (taxa_sucesso * 0.35) +
-                ((100 - risco_frustracao) * 0.20) +
-                (fator_obs * 0.10)
-            )
-            
-            # Classificação do Score
-            if score >= 80:
-                classificacao = "🏆 Excelente"
-            elif score >= 65:
-                classificacao = "🥈 Bom"
-            elif score >= 50:
-                classificacao = "🥉 Regular"
-            else:
-                classificacao = "⚠️ Baixo"
-            
-            resultados.append({
-                'Híbrido': hibrido,
-                'Observações': n_obs,
-                'Média': round(media_hibrido, 1),
-                'CV (%)': round(cv_hibrido, 1),
-                'Prob. Z (%)': round(prob_z, 1),
-                'Taxa Sucesso (%)': round(taxa_sucesso, 1),
-                'Risco (%)': round(risco_frustracao, 1),
-                'Score': round(score, 1),
-                'Classificação': classificacao
-            })
-    
-    # Criar DataFrame
-    df_conf = pd.DataFrame(resultados)
-    df_conf = df_conf.sort_values('Score', ascending=False).reset_index(drop=True)
-    df_conf.index = df_conf.index + 1
-    df_conf.index.name = 'Rank'
-    df_conf = df_conf.reset_index()
+    # Métricas em cache: reruns de modais, detalhamento e widgets que não mudam os filtros não recalculam.
+    # Atalho da sessão: mesmo df_filtrado (mesmo objeto) e mesmos filtros reaproveitam o resultado sem hashear df_analise
+    chave_conf = (coluna_producao, tuple(macros_selecionadas), tuple(hibridos_selecionados))
+    memo_conf = st.session_state.get("confiabilidade_memo")
+    if memo_conf is not None and memo_conf[0] is df_filtrado_sessao and memo_conf[1] == chave_conf:
+        df_conf, media_geral, limiar_sucesso = memo_conf[2]
+    else:
+        df_conf, media_geral, limiar_sucesso = calcular_confiabilidade(df_analise, coluna_producao, tuple(hibridos_selecionados))
+        st.session_state["confiabilidade_memo"] = (df_filtrado_sessao, chave_conf, (df_conf, media_geral, limiar_sucesso))
     
     # ============================================================
     # MÉTRICAS RESUMO
@@ -606,36 +772,16 @@ if len(df_analise) > 0 and len(hibridos_selecionados) > 0:
     col_t1, col_t2, col_t3, col_t4 = st.columns(4)
     
     with col_t1:
-        col_titulo, col_btn = st.columns([5, 1])
-        with col_titulo:
-            st.markdown("##### 📊 Probabilidade Z")
-        with col_btn:
-            if st.button("ℹ️", key="btn_info_prob", help="Como é calculada a Probabilidade Z"):
-                mostrar_explicacao_probabilidade_z()
+        titulo_com_info("##### 📊 Probabilidade Z", "btn_info_prob", "Como é calculada a Probabilidade Z", mostrar_explicacao_probabilidade_z)
     
     with col_t2:
-        col_titulo, col_btn = st.columns([5, 1])
-        with col_titulo:
-            st.markdown("##### ✅ Taxa de Sucesso")
-        with col_btn:
-            if st.button("ℹ️", key="btn_info_taxa", help="Como é calculada a Taxa de Sucesso"):
-                mostrar_explicacao_taxa_sucesso()
+        titulo_com_info("##### ✅ Taxa de Sucesso", "btn_info_taxa", "Como é calculada a Taxa de Sucesso", mostrar_explicacao_taxa_sucesso)
     
     with col_t3:
-        col_titulo, col_btn = st.columns([5, 1])
-        with col_titulo:
-            st.markdown("##### ⚠️ Risco de Frustração")
-        with col_btn:
-            if st.button("ℹ️", key="btn_info_risco", help="Como é calculado o Risco"):
-                mostrar_explicacao_risco()
+        titulo_com_info("##### ⚠️ Risco de Frustração", "btn_info_risco", "Como é calculado o Risco", mostrar_explicacao_risco)
     
     with col_t4:
-        col_titulo, col_btn = st.columns([5, 1])
-        with col_titulo:
-            st.markdown("##### 🏆 Score Final")
-        with col_btn:
-            if st.button("ℹ️", key="btn_info_score", help="Como é calculado o Score"):
-                mostrar_explicacao_score()
+        titulo_com_info("##### 🏆 Score Final", "btn_info_score", "Como é calculado o Score", mostrar_explicacao_score)
     
     col_m1, col_m2, col_m3, col_m4 = st.columns(4)
     
@@ -666,41 +812,10 @@ if len(df_analise) > 0 and len(hibridos_selecionados) > 0:
     top5 = df_conf.head(5)
     
     if len(top5) > 0:
-        categorias = ['Prob. Z', 'Taxa Sucesso', '100 - Risco', 'Score']
-        
-        fig_radar = go.Figure()
-        
-        cores_radar = px.colors.qualitative.Set2
-        
-        for idx, row in top5.iterrows():
-            valores = [
-                row['Prob. Z (%)'],
-                row['Taxa Sucesso (%)'],
-                100 - row['Risco (%)'],
-                row['Score']
-            ]
-            valores.append(valores[0])
-            
-            fig_radar.add_trace(go.Scatterpolar(
-                r=valores,
-                theta=categorias + [categorias[0]],
-                fill='toself',
-                name=row['Híbrido'],
-                line_color=cores_radar[idx % len(cores_radar)],
-                opacity=0.7
-            ))
-        
-        fig_radar.update_layout(
-            polar=dict(
-                radialaxis=dict(
-                    visible=True,
-                    range=[0, 100]
-                )
-            ),
-            showlegend=True,
-            title="Comparativo de Métricas - Top 5 Híbridos",
-            height=500
-        )
+        # Figura em cache (registros imutáveis do top 5 como chave): reruns sem mudança de ranking não a reconstroem
+        fig_radar = figura_radar(tuple(
+            top5[['Híbrido', 'Prob. Z (%)', 'Taxa Sucesso (%)', 'Risco (%)', 'Score']].itertuples(index=False, name=None)
+        ))
         
         st.plotly_chart(fig_radar, use_container_width=True)
     
@@ -710,42 +825,10 @@ if len(df_analise) > 0 and len(hibridos_selecionados) > 0:
     # GRÁFICO DE BARRAS - RANKING
     # ============================================================
     
-    col_titulo_rank, col_info_rank = st.columns([11, 1])
-    
-    with col_titulo_rank:
-        st.markdown("### 🏆 Ranking de Confiabilidade")
+    titulo_com_info("### 🏆 Ranking de Confiabilidade", "btn_info_ranking", "Entenda o Ranking de Confiabilidade",
+                    mostrar_explicacao_ranking, proporcao=(11, 1))
     
-    with col_info_rank:
-        if st.button("ℹ️", key="btn_info_ranking", help="Entenda o Ranking de Confiabilidade"):
-            mostrar_explicacao_ranking()
-    
-    fig_score = px.bar(
-        df_conf.sort_values('Score', ascending=True),
-        x='Score',
-        y='Híbrido',
-        orientation='h',
-        color='Score',
-        color_continuous_scale='RdYlGn',
-        title="Score de Confiabilidade por Híbrido",
-        text='Score'
-    )
-    
-    fig_score.update_traces(texttemplate='%{text:.1f}', textposition='outside')
-    
-    fig_score.add_vline(x=80, line_dash="dash", line_color="green", line_width=2,
-                        annotation_text="Excelente (80)", annotation_position="top")
-    fig_score.add_vline(x=65, line_dash="dash", line_color="orange", line_width=1,
-                        annotation_text="Bom (65)", annotation_position="bottom")
-    fig_score.add_vline(x=50, line_dash="dash", line_color="red", line_width=1,
-                        annotation_text="Regular (50)", annotation_position="top")
-    
-    fig_score.update_layout(
-        plot_bgcolor='white',
-        paper_bgcolor='white',
-        height=max(400, len(df_conf) * 35),
-        xaxis=dict(range=[0, 105]),
-        showlegend=False
-    )
+    fig_score = figura_ranking(tuple(zip(df_conf['Híbrido'], df_conf['Score'])))
     
     st.plotly_chart(fig_score, use_container_width=True)
     
@@ -767,7 +850,7 @@ if len(df_analise) > 0 and len(hibridos_selecionados) > 0:
     
     st.download_button(
         label="📥 Download Confiabilidade (CSV)",
-        data=df_conf.to_csv(index=False).encode('utf-8'),
+        data=partial(gerar_csv, df_conf),
         file_name=f"confiabilidade_hibridos_{coluna_producao}.csv",
         mime="text/csv"
     )
@@ -788,7 +871,9 @@ if len(df_analise) > 0 and len(hibridos_selecionados) > 0:
     
     if hibrido_detalhe:
         dados_hibrido = df_conf[df_conf['Híbrido'] == hibrido_detalhe].iloc[0]
-        df_h_detalhe = df_analise[df_analise['hibrido'] == hibrido_detalhe][coluna_producao].dropna()
+        # Observações do híbrido pelos códigos da categoria (comparação de inteiros, sem máscara de texto)
+        df_h_detalhe = df_analise[coluna_producao].to_numpy()[mascara_categorias(df_analise['hibrido'], [hibrido_detalhe])]
+        df_h_detalhe = df_h_detalhe[~np.isnan(df_h_detalhe)]
         
         col_d1, col_d2 = st.columns([1, 2])
         
@@ -813,9 +898,12 @@ if len(df_analise) > 0 and len(hibridos_selecionados) > 0:
         with col_d2:
             fig_hist = go.Figure()
             
-            fig_hist.add_trace(go.Histogram(
-                x=df_h_detalhe,
-                nbinsx=15,
+            # Contagens calculadas no servidor: o navegador recebe 15 barras em vez de todas as observações
+            contagem, bordas = np.histogram(df_h_detalhe, bins=15)
+            fig_hist.add_trace(go.Bar(
+                x=(bordas[:-1] + bordas[1:]) / 2,
+                y=contagem,
+                width=np.diff(bordas),
                 name='Distribuição',
                 marker_color=PALETA_CORES['primary'],
                 opacity=0.7
@@ -838,6 +926,7 @@ if len(df_analise) > 0 and len(hibridos_selecionados) > 0:
                 yaxis_title="Frequência",
                 plot_bgcolor='white',
                 paper_bgcolor='white',
+                bargap=0,
                 height=400
             )
             
@@ -882,11 +971,4 @@ else:
 # ============================================================
 st.markdown("---")
 
-st.markdown(f"""
-    <div style='text-align: center; color: {PALETA_CORES['primary']}; padding: 2rem 0;'>
-        <p style='font-weight: 600;'>Confiabilidade dos Híbridos | Sistema de Produção Agrícola</p>
-        <p style='font-size: 0.875rem; color: {PALETA_CORES['secondary']};'>
-            Última atualização: {pd.Timestamp.now().strftime('%d/%m/%Y %H:%M:%S')}
-        </p>
-    </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+st.markdown(RODAPE_HTML.format(atualizacao=datetime.now().strftime('%d/%m/%Y %H:%M:%S')), unsafe_allow_html=True)
\ No newline at end of file
@@ -4,13 +4,37 @@
 # ============================================================
 
 from pathlib import Path
+import copy
+import os
+import tempfile
 from io import BytesIO
+import hashlib
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+from pyarrow import csv as pacsv
 import streamlit as st
 import logging
 from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode, DataReturnMode, JsCode
 import json
 from datetime import datetime
+from functools import lru_cache
+from string import Template
+
+try:
+    import orjson
+except ImportError:  # opcional: sem orjson, o JSON sai pelo to_json do pandas
+    orjson = None
+
+try:
+    import python_calamine  # noqa: F401
+    MOTOR_EXCEL = "calamine"
+except ImportError:  # opcional: sem python-calamine, a planilha é lida pelo openpyxl
+    MOTOR_EXCEL = "openpyxl"
+
+# Copy-on-Write: fatias e seleções compartilham memória até serem modificadas,
+# dispensando .copy() defensivos nas páginas
+pd.options.mode.copy_on_write = True
 
 # Configurar logging
 logging.basicConfig(
@@ -37,13 +61,14 @@ COLUNAS_NUMERICAS_FORCADAS = [
 # FUNÇÕES DE CARREGAMENTO E VALIDAÇÃO
 # ============================================================
 
-def converter_colunas_numericas(df: pd.DataFrame, colunas: list = None) -> pd.DataFrame:
+def converter_colunas_numericas(df: pd.DataFrame, colunas: list = None, copiar: bool = False) -> pd.DataFrame:
     """
     Converte colunas especificadas para tipo numérico.
     
     Args:
         df: DataFrame a ser convertido
         colunas: Lista de colunas para converter (usa COLUNAS_NUMERICAS_FORCADAS se None)
+        copiar: Preserva o DataFrame recebido (por padrão as colunas são substituídas nele mesmo)
     
     Returns:
         DataFrame com colunas convertidas
@@ -51,11 +76,13 @@ def converter_colunas_numericas(df: pd.DataFrame, colunas: list = None) -> pd.Da
     if colunas is None:
         colunas = COLUNAS_NUMERICAS_FORCADAS
     
-    df_conv = df.copy()
+    # Sem cópia por padrão: quem chama (carregar_excel_com_validacao) descarta o original
+    df_conv = df.copy() if copiar else df
     colunas_convertidas = []
     
     for col in colunas:
-        if col in df_conv.columns:
+        # Colunas que o leitor já entregou como numéricas não passam por outro to_numeric
+        if col in df_conv.columns and not pd.api.types.is_numeric_dtype(df_conv[col]):
             # Tentar converter para numérico
             df_conv[col] = pd.to_numeric(df_conv[col], errors='coerce')
             colunas_convertidas.append(col)
@@ -66,17 +93,51 @@ def converter_colunas_numericas(df: pd.DataFrame, colunas: list = None) -> pd.Da
     return df_conv
 
 
-def carregar_excel_com_validacao(caminho: Path) -> pd.DataFrame:
+def converter_colunas_categoricas(df: pd.DataFrame, limite: float = 0.5) -> pd.DataFrame:
+    """
+    Converte colunas de texto de baixa cardinalidade (únicos/linhas < limite) em category
+    Colunas com tipos mistos ficam como object (o Parquet e o to_datetime tratam-nas à parte)
+    """
+    colunas_convertidas = []
+    
+    for col in df.select_dtypes(include=["object"]).columns:
+        if pd.api.types.infer_dtype(df[col], skipna=True) != "string":
+            continue
+        if df[col].nunique() / max(len(df), 1) < limite:
+            df[col] = df[col].astype("category")
+            colunas_convertidas.append(col)
+    
+    if colunas_convertidas:
+        logger.info(f"🏷️ Colunas convertidas para category: {colunas_convertidas}")
+    
+    return df
+
+
+def carregar_excel_com_validacao(caminho: Path, usecols: set = None) -> pd.DataFrame:
     """
     Carrega arquivo Excel com validação, logging e conversão de colunas numéricas
+    usecols: colunas a ler (as ausentes na planilha são ignoradas); None lê todas
     """
     try:
         logger.info(f"Iniciando carregamento de: {caminho}")
-        df = pd.read_excel(caminho)
+        # calamine (leitor em Rust) quando instalado; senão openpyxl em modo somente leitura
+        # (stream das linhas, sem montar o DOM completo da planilha) e valores já calculados das fórmulas.
+        # dtype/parse_dates não são passados porque a planilha mistura texto em colunas numéricas
+        # e datas dd/mm/aaaa, tratados depois com errors="coerce"
+        df = pd.read_excel(
+            caminho,
+            engine=MOTOR_EXCEL,
+            engine_kwargs={"read_only": True, "data_only": True} if MOTOR_EXCEL == "openpyxl" else None,
+            usecols=(lambda col: col in usecols) if usecols is not None else None
+        )
+        logger.info(f"📖 Planilha lida com o motor {MOTOR_EXCEL}")
         logger.info(f"✅ Dados carregados: {len(df):,} registros, {len(df.columns)} colunas")
         
-        # Converter colunas numéricas automaticamente
-        df = converter_colunas_numericas(df)
+        # Converter colunas numéricas automaticamente e já reduzir para float32 / menor inteiro
+        memoria_antes = df.memory_usage().sum()
+        df = reduzir_tipos_numericos(converter_colunas_numericas(df))
+        df = converter_colunas_categoricas(df)
+        logger.info(f"🪶 Memória numérica: {memoria_antes / 1e6:.2f} MB → {df.memory_usage().sum() / 1e6:.2f} MB")
         
         return df
     except FileNotFoundError:
@@ -87,12 +148,57 @@ def carregar_excel_com_validacao(caminho: Path) -> pd.DataFrame:
         raise
 
 
+def carregar_excel_com_cache_parquet(caminho: Path, usecols: set = None) -> pd.DataFrame:
+    """
+    Carrega o Excel via carregar_excel_com_validacao mantendo um Parquet ao lado (sidecar)
+    O Parquet é reutilizado enquanto a assinatura (mtime, tamanho e colunas) do Excel não mudar
+    """
+    stat = caminho.stat()
+    # A lista de colunas entra na assinatura: mudar as colunas lidas invalida o Parquet
+    hash_colunas = hashlib.sha1(",".join(sorted(usecols or [])).encode("utf-8")).hexdigest()[:12]
+    assinatura = f"{stat.st_mtime_ns}:{stat.st_size}:{hash_colunas}"
+    arq_parquet = caminho.with_suffix(".parquet")
+    arq_assinatura = caminho.with_suffix(".sig")
+
+    if arq_parquet.exists() and arq_assinatura.exists():
+        if arq_assinatura.read_text(encoding="utf-8").strip() == assinatura:
+            try:
+                # Reaplica a redução de tipos: Parquets gravados antes dela ainda trazem float64 e textos object
+                df_cache = converter_colunas_categoricas(reduzir_tipos_numericos(pd.read_parquet(arq_parquet)))
+                logger.info(f"⚡ Dados carregados do cache Parquet: {arq_parquet.name}")
+                return df_cache
+            except Exception as e:
+                logger.warning(f"⚠️ Cache Parquet inválido, relendo Excel: {str(e)}")
+
+    df_excel = carregar_excel_com_validacao(caminho, usecols=usecols)
+
+    # Colunas com tipos mistos (ex.: datas como texto e serial do Excel) não são aceitas pelo Parquet
+    for col in df_excel.select_dtypes(include=["object"]).columns:
+        if pd.api.types.infer_dtype(df_excel[col], skipna=True).startswith("mixed"):
+            df_excel[col] = df_excel[col].where(df_excel[col].isna(), df_excel[col].astype(str))
+    # As colunas mistas viraram texto: categoriza de novo para o retorno ser igual ao da leitura do Parquet
+    df_excel = converter_colunas_categoricas(df_excel)
+
+    try:
+        df_excel.to_parquet(arq_parquet, compression="zstd", index=False)
+        arq_assinatura.write_text(assinatura, encoding="utf-8")
+        logger.info(f"💾 Cache Parquet gravado: {arq_parquet.name}")
+    except Exception as e:
+        logger.warning(f"⚠️ Não foi possível gravar o cache Parquet: {str(e)}")
+
+    return df_excel
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
 def validar_qualidade_dados(df: pd.DataFrame) -> dict:
     """
     Retorna estatísticas de qualidade dos dados
+    Em cache: a base bruta é a mesma a cada rerun, então isnull/duplicated rodam uma vez
     """
     total_valores = df.size
-    valores_nulos = df.isnull().sum().sum()
+    # Uma única passada na máscara de nulos: total e colunas vazias saem da contagem por coluna
+    nulos_coluna = df.isnull().sum()
+    valores_nulos = int(nulos_coluna.sum())
     
     qualidade = {
         "total_registros": len(df),
@@ -100,7 +206,7 @@ def validar_qualidade_dados(df: pd.DataFrame) -> dict:
         "valores_nulos": valores_nulos,
         "percentual_nulos": (valores_nulos / total_valores * 100) if total_valores > 0 else 0,
         "duplicatas": df.duplicated().sum(),
-        "colunas_vazias": [col for col in df.columns if df[col].isnull().all()],
+        "colunas_vazias": nulos_coluna.index[nulos_coluna == len(df)].tolist(),
         "completude": ((total_valores - valores_nulos) / total_valores * 100) if total_valores > 0 else 0
     }
     
@@ -116,34 +222,105 @@ def processar_datas_safra(df: pd.DataFrame) -> pd.DataFrame:
     Processa coluna de plantio e cria coluna safra
     """
     if "plantio" in df.columns:
-        df["plantio"] = pd.to_datetime(df["plantio"], errors="coerce", dayfirst=True)
-        df["safra"] = df["plantio"].dt.year
+        plantio = df["plantio"]
+        if isinstance(plantio.dtype, pd.CategoricalDtype):
+            # Só as datas distintas são convertidas; o código -1 (vazio) aponta para o NaT final
+            datas = np.append(_converter_datas(plantio.cat.categories).to_numpy(), np.datetime64("NaT", "ns"))
+            df["plantio"] = pd.Series(datas[plantio.cat.codes.to_numpy()], index=df.index)
+        elif not pd.api.types.is_datetime64_any_dtype(plantio):
+            df["plantio"] = _converter_datas(plantio)
+        # Ano em inteiro de 2 bytes (nullable: plantio inválido vira <NA>)
+        df["safra"] = df["plantio"].dt.year.astype("Int16")
         logger.info("✅ Datas processadas e safra criada")
     return df
 
 
+def _converter_datas(valores):
+    """
+    Converte datas dd/mm/aaaa pelo formato fixo (caminho rápido em C)
+    Se algum valor fugir do formato, cai na inferência com dayfirst=True e errors="coerce"
+    """
+    try:
+        return pd.to_datetime(valores, format="%d/%m/%Y", errors="raise")
+    except (ValueError, TypeError):
+        return pd.to_datetime(valores, errors="coerce", dayfirst=True)
+
+
+def reduzir_tipos_numericos(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reduz colunas numéricas para float32 / menor inteiro suficiente
+    Medições agronômicas não precisam de float64: a conversão só é evitada fora da faixa do float32
+    """
+    colunas_float = df.select_dtypes(include=["float64"]).columns
+    colunas_int = df.select_dtypes(include=["int64"]).columns
+    limite_float32 = np.finfo(np.float32).max
+    
+    for col in colunas_float:
+        # to_numeric(downcast="float") recusa valores como 51111.11 (não exatos em float32)
+        if not (df[col].abs() > limite_float32).any():
+            df[col] = df[col].astype("float32")
+    for col in colunas_int:
+        df[col] = pd.to_numeric(df[col], downcast="integer")
+    
+    if len(colunas_float) or len(colunas_int):
+        logger.info(f"🪶 Tipos numéricos reduzidos: {len(colunas_float)} float, {len(colunas_int)} inteiras")
+    return df
+
+
 def criar_produtor_fazenda(df: pd.DataFrame) -> pd.DataFrame:
     """
     Cria coluna produtor_fazenda concatenada
     """
     if {"produtor", "fazenda"}.issubset(df.columns):
-        df["produtor_fazenda"] = (
-            df["produtor"].astype(str).str.upper().str.strip()
-            + "_"
-            + df["fazenda"].astype(str).str.upper().str.strip()
+        # Strings Arrow: upper/strip/concatenação rodam nos kernels do pyarrow, sem objetos Python por célula
+        # (fillna("nan") mantém o texto "NAN" que o astype(str) gerava para vazios)
+        produtor, fazenda = (
+            df[col].astype("string[pyarrow]").fillna("nan").str.upper().str.strip()
+            for col in ("produtor", "fazenda")
         )
+        df["produtor_fazenda"] = produtor + "_" + fazenda
         logger.info("✅ Coluna produtor_fazenda criada")
     return df
 
 
+def mascara_categorias(serie: pd.Series, valores) -> np.ndarray:
+    """
+    Máscara booleana de pertencimento a `valores`
+    Em colunas categóricas compara os códigos inteiros em vez dos textos
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos = serie.cat.categories.get_indexer(list(set(valores)))
+        return np.isin(serie.cat.codes.to_numpy(), codigos[codigos >= 0])
+    return serie.isin(valores).to_numpy()
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def opcoes_ordenadas(serie: pd.Series) -> list:
+    """Valores únicos ordenados de uma coluna (opções dos multiselects)"""
+    return sorted(serie.dropna().unique())
+
+
+def categorias_presentes(serie: pd.Series) -> list:
+    """Opções ordenadas a partir das categorias (sem unique/sort); cai em opcoes_ordenadas se não houver"""
+    if isinstance(serie.dtype, pd.CategoricalDtype) and serie.cat.categories.is_monotonic_increasing:
+        codigos = serie.cat.codes.to_numpy()
+        presentes = np.bincount(codigos[codigos >= 0], minlength=len(serie.cat.categories)) > 0
+        return serie.cat.categories[presentes].tolist()
+    return opcoes_ordenadas(serie)
+
+
 def filtrar_valores_vazios(df: pd.DataFrame, coluna: str) -> tuple:
     """
     Remove linhas com valores vazios em uma coluna específica
     Retorna: (df_filtrado, qtd_removidas)
     """
     antes = len(df)
-    df = df[df[coluna].notna()].copy()
-    df = df[df[coluna] != ""].copy()
+    serie = df[coluna]
+    # Uma única máscara; texto vazio só é testado em colunas não numéricas
+    mascara = serie.notna()
+    if not pd.api.types.is_numeric_dtype(serie):
+        mascara &= serie != ""
+    df = df.loc[mascara]
     depois = len(df)
     removidas = antes - depois
     
@@ -155,15 +332,41 @@ def filtrar_valores_vazios(df: pd.DataFrame, coluna: str) -> tuple:
 # ============================================================
 # FUNÇÕES DE VISUALIZAÇÃO (AGGRID)
 # ============================================================
+# Formatadores JS montados uma única vez no import (iguais para todas as colunas e grids)
+FORMATADOR_NUMERO_JS = JsCode("""
+    function(params) {
+        if (params.value == null) return '';
+        return params.value.toLocaleString('pt-BR', {
+            minimumFractionDigits: 1,
+            maximumFractionDigits: 1
+        });
+    }
+""")
+
+FORMATADOR_DATA_JS = JsCode("""
+    function(params) {
+        if (params.value == null) return '';
+        return new Date(params.value).toLocaleDateString('pt-BR', {timeZone: 'UTC'});
+    }
+""")
+
+AJUSTAR_COLUNAS_JS = JsCode("""
+    function(params) {
+        params.api.sizeColumnsToFit();
+    }
+""")
 
-def criar_aggrid(df: pd.DataFrame, altura: int = 400, colunas_texto: list = None) -> object:
+
+@lru_cache(maxsize=32)
+def _opcoes_grid(colunas: tuple, tipos: tuple, texto: frozenset, tamanho_pagina: int) -> dict:
     """
-    Cria um AgGrid configurado com todas as funcionalidades
+    gridOptions montados pelo GridOptionsBuilder para um esquema (colunas + dtypes)
+    Em cache no processo: reruns com a mesma tabela não percorrem o builder de novo
     """
-    if colunas_texto is None:
-        colunas_texto = ["safra"]
-    
-    gb = GridOptionsBuilder.from_dataframe(df)
+    # DataFrame vazio com o mesmo esquema: o builder só olha nomes e dtypes das colunas
+    gb = GridOptionsBuilder.from_dataframe(
+        pd.DataFrame({col: pd.Series(dtype=tipo) for col, tipo in zip(colunas, tipos)})
+    )
     
     # Configurações padrão
     gb.configure_default_column(
@@ -181,25 +384,23 @@ def criar_aggrid(df: pd.DataFrame, altura: int = 400, colunas_texto: list = None
         autoHeight=False
     )
     
-    # Formatar colunas
-    for col in df.columns:
-        if col.lower() in [c.lower() for c in colunas_texto]:
+    # Formatar colunas (classificação calculada uma vez, fora do laço)
+    numericas = {c for c, t in zip(colunas, tipos) if pd.api.types.is_numeric_dtype(t)}
+    datas = {c for c, t in zip(colunas, tipos) if pd.api.types.is_datetime64_any_dtype(t)}
+    
+    for col in colunas:
+        if col.lower() in texto:
             gb.configure_column(col, type=["textColumn"])
-        elif pd.api.types.is_numeric_dtype(df[col]):
+        elif col in numericas:
             gb.configure_column(
                 col,
                 type=["numericColumn"],
                 precision=1,
-                valueFormatter=JsCode("""
-                    function(params) {
-                        if (params.value == null) return '';
-                        return params.value.toLocaleString('pt-BR', {
-                            minimumFractionDigits: 1,
-                            maximumFractionDigits: 1
-                        });
-                    }
-                """)
+                valueFormatter=FORMATADOR_NUMERO_JS
             )
+        elif col in datas:
+            # Datas formatadas no navegador (mantém ordenação cronológica)
+            gb.configure_column(col, valueFormatter=FORMATADOR_DATA_JS)
     
     # Configurações adicionais
     gb.configure_selection(
@@ -215,7 +416,11 @@ def criar_aggrid(df: pd.DataFrame, altura: int = 400, colunas_texto: list = None
         defaultToolPanel=""
     )
     
-    gb.configure_pagination(enabled=False)
+    gb.configure_pagination(
+        enabled=True,
+        paginationAutoPageSize=False,
+        paginationPageSize=tamanho_pagina
+    )
     
     gb.configure_grid_options(
         domLayout='normal',
@@ -229,17 +434,42 @@ def criar_aggrid(df: pd.DataFrame, altura: int = 400, colunas_texto: list = None
         suppressColumnVirtualisation=False,
         suppressRowVirtualisation=False,
         suppressRowClickSelection=False,
-        onGridReady=JsCode("""
-            function(params) {
-                params.api.sizeColumnsToFit();
-            }
-        """)
+        onGridReady=AJUSTAR_COLUNAS_JS
     )
     
-    gridOptions = gb.build()
+    return gb.build()
+
+
+def criar_aggrid(df: pd.DataFrame, altura: int = 400, colunas_texto: list = None,
+                 tamanho_pagina: int = 100, max_linhas: int = None) -> object:
+    """
+    Cria um AgGrid configurado com todas as funcionalidades
+    
+    Args:
+        df: DataFrame a ser exibido
+        altura: Altura do grid em pixels
+        colunas_texto: Colunas exibidas como texto (sem formatação numérica)
+        tamanho_pagina: Linhas por página (o navegador renderiza uma página por vez)
+        max_linhas: Limite de linhas enviadas ao navegador (None envia todas)
+    """
+    if colunas_texto is None:
+        colunas_texto = ["safra"]
+    
+    if max_linhas is not None and len(df) > max_linhas:
+        st.caption(f"👁️ Prévia com as primeiras {max_linhas:,} de {len(df):,} linhas (use o download para a base completa)")
+        df = df.head(max_linhas)
     
+    # Opções em cache por esquema; cópia profunda porque o AgGrid altera o dicionário recebido
+    gridOptions = copy.deepcopy(_opcoes_grid(
+        tuple(df.columns),
+        tuple(str(tipo) for tipo in df.dtypes),
+        frozenset(c.lower() for c in colunas_texto),
+        tamanho_pagina,
+    ))
+    
+    # Cópia rasa: o AgGrid insere a coluna ::auto_unique_id:: no DataFrame recebido
     return AgGrid(
-        df,
+        df.copy(deep=False),
         gridOptions=gridOptions,
         height=altura,
         fit_columns_on_grid_load=True,
@@ -265,13 +495,20 @@ def df_para_excel_bytes(df_export: pd.DataFrame) -> bytes:
     Converte DataFrame para bytes do Excel
     """
     buffer = BytesIO()
-    df_tmp = df_export.copy()
-
-    for col in df_tmp.select_dtypes(include=["datetime", "datetimetz"]).columns:
-        df_tmp[col] = pd.to_datetime(df_tmp[col], errors="coerce", dayfirst=True).dt.strftime("%d/%m/%Y")
-
-    if "plantio" in df_tmp.columns:
-        df_tmp["plantio"] = pd.to_datetime(df_tmp["plantio"], errors="coerce", dayfirst=True).dt.strftime("%d/%m/%Y")
+    # Colunas de data (e "plantio", mesmo se ainda vier como texto) formatadas uma única vez
+    colunas_data = list(df_export.select_dtypes(include=["datetime", "datetimetz"]).columns)
+    if "plantio" in df_export.columns and "plantio" not in colunas_data:
+        colunas_data.append("plantio")
+    
+    datas_formatadas = {}
+    for col in colunas_data:
+        serie = df_export[col]
+        if not pd.api.types.is_datetime64_any_dtype(serie):
+            serie = pd.to_datetime(serie, errors="coerce", dayfirst=True)
+        datas_formatadas[col] = serie.dt.strftime("%d/%m/%Y")
+    
+    # Sem cópia: assign só troca as colunas de data, as demais compartilham memória (Copy-on-Write)
+    df_tmp = df_export.assign(**datas_formatadas) if datas_formatadas else df_export
 
     with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
         df_tmp.to_excel(writer, index=False, sheet_name="dados")
@@ -285,16 +522,54 @@ def df_para_csv_bytes(df_export: pd.DataFrame) -> bytes:
     """
     Converte DataFrame para bytes do CSV
     """
-    csv = df_export.to_csv(index=False).encode('utf-8')
+    # Datas já em texto (dd/mm/aaaa); o restante é escrito pelo writer C multi-thread do pyarrow
+    colunas_data = df_export.select_dtypes(include=["datetime", "datetimetz"]).columns
+    df_tmp = df_export.assign(**{
+        col: df_export[col].dt.strftime("%d/%m/%Y") for col in colunas_data
+    })
+    
+    try:
+        buffer = pa.BufferOutputStream()
+        pacsv.write_csv(pa.Table.from_pandas(df_tmp, preserve_index=False), buffer)
+        csv = buffer.getvalue().to_pybytes()
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        # Colunas com tipos mistos que o Arrow não converte: caminho do pandas
+        csv = df_export.to_csv(index=False, date_format="%d/%m/%Y").encode('utf-8')
+    
     logger.info(f"📄 CSV gerado: {len(df_export)} registros")
     return csv
 
 
+def _valor_json(valor):
+    """
+    Converte valores que o orjson não serializa nativamente (pd.NA, Timestamp etc.)
+    """
+    return None if pd.isna(valor) else str(valor)
+
+
 def df_para_json_str(df_export: pd.DataFrame) -> str:
     """
     Converte DataFrame para string JSON
     """
-    json_str = df_export.to_json(orient='records', indent=2, force_ascii=False)
+    colunas_data = df_export.select_dtypes(include=["datetime", "datetimetz"]).columns
+    colunas_float32 = df_export.select_dtypes(include=["float32"]).columns
+    # float32 passa pela representação decimal mais curta (31.4, e não 31.399999618530273):
+    # to_dict/to_json alargariam o valor binário para float64 e exporiam o ruído de precisão
+    if len(colunas_data) or len(colunas_float32):
+        df_export = df_export.assign(
+            **{col: df_export[col].dt.strftime("%d/%m/%Y") for col in colunas_data},
+            **{col: df_export[col].to_numpy().astype(str).astype("float64") for col in colunas_float32},
+        )
+
+    if orjson is not None:
+        # Encoder C do orjson sobre os registros (NaN vira null, como no to_json)
+        json_str = orjson.dumps(
+            df_export.to_dict(orient='records'),
+            option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+            default=_valor_json,
+        ).decode('utf-8')
+    else:
+        json_str = df_export.to_json(orient='records', indent=2, force_ascii=False)
     logger.info(f"🔧 JSON gerado: {len(df_export)} registros")
     return json_str
 
@@ -310,8 +585,24 @@ def salvar_configuracao(config_dict: dict, caminho: str = "config_producao.json"
         # Adicionar timestamp
         config_dict["timestamp"] = datetime.now().isoformat()
         
-        with open(caminho, "w", encoding="utf-8") as f:
-            json.dump(config_dict, f, indent=2, ensure_ascii=False)
+        if orjson is not None:
+            conteudo = orjson.dumps(
+                config_dict,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+            )
+        else:
+            conteudo = json.dumps(config_dict, indent=2, ensure_ascii=False).encode("utf-8")
+        
+        # Escrita atômica: grava em arquivo temporário na mesma pasta e substitui o destino
+        # (uma falha no meio da gravação nunca deixa o JSON truncado)
+        fd, caminho_tmp = tempfile.mkstemp(dir=os.path.dirname(caminho) or ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(conteudo)
+            os.replace(caminho_tmp, caminho)
+        except BaseException:
+            os.unlink(caminho_tmp)
+            raise
         
         logger.info(f"💾 Configuração salva em: {caminho}")
         return True
@@ -357,7 +648,8 @@ def criar_metricas_principais(df_filtrado: pd.DataFrame, df_raw: pd.DataFrame,
         )
 
     with col2:
-        total_hibridos = df_filtrado["hibrido"].nunique() if "hibrido" in df_filtrado.columns else 0
+        # Contagens pelos códigos da categoria (ou pelas opções em cache), sem nunique a cada rerun
+        total_hibridos = len(categorias_presentes(df_filtrado["hibrido"])) if "hibrido" in df_filtrado.columns else 0
         st.metric(
             label="🧬 Híbridos Ativos",
             value=total_hibridos
@@ -371,7 +663,7 @@ def criar_metricas_principais(df_filtrado: pd.DataFrame, df_raw: pd.DataFrame,
         )
 
     with col4:
-        total_safras = df_filtrado["safra"].nunique() if "safra" in df_filtrado.columns else 0
+        total_safras = len(categorias_presentes(df_filtrado["safra"])) if "safra" in df_filtrado.columns else 0
         st.metric(
             label="🌾 Safras",
             value=total_safras
@@ -388,4 +680,17 @@ def criar_breadcrumb(pagina_atual: str = "Produção") -> None:
             <span style='color: #ccc;'> / </span>
             <span style='color: #00a859; font-weight: 600;'>{pagina_atual}</span>
         </div>
-    """, unsafe_allow_html=True)
\ No newline at end of file
+    """, unsafe_allow_html=True)
+
+
+@lru_cache(maxsize=32)
+def _substituir_template(template: str, valores: tuple) -> str:
+    return Template(template).substitute(dict(valores))
+
+
+def preencher_template(template: str, **valores) -> str:
+    """
+    Substitui os $campos de um template HTML/CSS (string.Template)
+    O resultado fica em cache no processo: páginas reexecutadas a cada rerun não refazem a montagem
+    """
+    return _substituir_template(template, tuple(sorted(valores.items())))